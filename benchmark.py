@@ -0,0 +1,373 @@
+"""
+MCLP BENCHMARK
+*********************************************
+Times the heuristics on synthetic instance families, and flags regressions against a
+previous run.
+
+*INPUT:
+    * Instance families to run -> -F, --families (small, medium, large, clustered)
+    * Repetitions of each case -> -r, --repetitions
+    * Seed of the instances -> --seed
+    * Swap strategy of the local search -> -l, --local-search
+    * Results file (JSON) -> -o, --output
+    * Baseline results file (JSON, a previous output) -> -b, --baseline
+    * Allowed slowdown / memory growth before flagging a regression -> -t, --tolerance
+
+*CASES:
+    * Each case is an (I, J, p, radius) size on a [0, max_value) square, with a population
+      distribution of instance_generator.py (uniform, clusters, cities or grid). The candidate
+      sites come from instance_generator.generate_candidate_sites. Every case is seeded, so
+      each run solves the same instances.
+    * The clustered family has dense clusters next to sparse areas, where a site can cover
+      huge node sets (skewed coverage).
+
+*PHASES:
+    * coverage => Coverage index (build_coverage)
+    * ch => Constructive Heuristic, over the coverage index
+    * ls => Local Search from the CH solution
+    * ga => Greedy Adding, over the coverage index
+
+*OUTPUT (JSON):
+    * Per case and phase: median, p10 and p90 time (s) of the repetitions, and peak
+      memory (bytes, tracemalloc, measured on one extra run so timings aren't slowed down)
+    * Per case: objective function of CH, LS and GA
+    * Exit code 1 if a regression was flagged
+*********************************************
+"""
+
+import contextlib
+import io
+import json
+import numpy as np
+import platform
+import time
+import tracemalloc
+
+from coverage_index import build_coverage
+from instance_generator import generate_candidate_sites, population_model, sample_population
+from mclp import mclp_ch, mclp_ga, mclp_ls
+from optparse import OptionParser
+
+
+# (I, J, p, radius, max_value, distribution) of each instance family
+BENCHMARK_FAMILIES = {
+    'small': [
+        (1000, 100, 10, 15, 200, 'uniform'),
+        (2000, 200, 20, 15, 300, 'uniform'),
+    ],
+    'medium': [
+        (10000, 500, 25, 30, 1000, 'uniform'),
+        (50000, 1000, 50, 40, 2000, 'uniform'),
+    ],
+    'large': [
+        (200000, 2000, 100, 60, 5000, 'uniform'),
+        (1000000, 5000, 200, 80, 10000, 'uniform'),
+    ],
+    'clustered': [
+        (20000, 500, 25, 30, 1000, 'clusters'),
+        (20000, 500, 25, 30, 1000, 'cities'),
+        (20000, 500, 25, 30, 1000, 'grid'),
+    ],
+}
+
+PHASES = ['coverage', 'ch', 'ls', 'ga']
+
+# Time differences below this (s) are timer noise, never flagged as regressions
+MIN_TIME_DIFFERENCE = 0.005
+
+
+def main():
+    get_input = getInput()
+
+    options = get_input[0]
+    arguments = get_input[1]
+
+    families = options.families.split(',')
+    for family in families:
+        if family not in BENCHMARK_FAMILIES:
+            print(f"[-] Error: unknown instance family '{family}' ({', '.join(BENCHMARK_FAMILIES)}).")
+            print("[*] Use 'benchmark.py -h' to get information of use.")
+            exit()
+
+    cases = [case for family in families for case in BENCHMARK_FAMILIES[family]]
+
+    print(f"[*] Cases to run: {len(cases)}")
+    print(f"[*] Repetitions: {options.repetitions}")
+    print(f"[*] Seed: {options.seed}")
+
+    results = {
+        'seed': options.seed,
+        'repetitions': options.repetitions,
+        'local_search': options.local_search,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cases': [],
+    }
+
+    for case_index, case in enumerate(cases):
+        case_result = run_case(case, options.seed + case_index, options.repetitions, options.local_search)
+        results['cases'].append(case_result)
+
+    with open(options.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n[+] Results written to {options.output}")
+
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare_results(results, baseline, options.tolerance)
+
+        if regressions > 0:
+            print(f"\n[-] {regressions} regressions against {options.baseline}.")
+            exit(1)
+
+        print(f"\n[+] No regressions against {options.baseline}.")
+
+
+def getInput():
+    parser = OptionParser()
+    parser.add_option("-F", "--families",
+                      dest="families",
+                      help=f"String value - Comma separated instance families to run ({', '.join(BENCHMARK_FAMILIES)}). Default: small,medium.",
+                      type=str,
+                      default="small,medium")
+    parser.add_option("-r", "--repetitions",
+                      dest="repetitions",
+                      help="INT value - Repetitions of each case. Default: 5.",
+                      type=int,
+                      default=5)
+    parser.add_option("--seed",
+                      dest="seed",
+                      help="INT value - Seed of the first case, the next cases use the following seeds. Default: 0.",
+                      type=int,
+                      default=0)
+    parser.add_option("-l", "--local-search",
+                      dest="local_search",
+                      help="STRING value - Swap strategy of the local search: 'first', 'best' or 'matrix'. Default: best.",
+                      type="choice",
+                      choices=["first", "best", "matrix"],
+                      default="best")
+    parser.add_option("-o", "--output",
+                      dest="output",
+                      help="STRING value - Results file (JSON). Default: benchmark_results.json.",
+                      type=str,
+                      default="benchmark_results.json")
+    parser.add_option("-b", "--baseline",
+                      dest="baseline",
+                      help="STRING value - Baseline results file (JSON) to compare against.",
+                      type=str)
+    parser.add_option("-t", "--tolerance",
+                      dest="tolerance",
+                      help="FLOAT value - Allowed median time and peak memory growth over the baseline (0.2 = 20%). Default: 0.2.",
+                      type=float,
+                      default=0.2)
+    (options, args) = parser.parse_args()
+
+    return options, args
+
+
+def case_name(case):
+    I_size, J_size, p, radius, max_value, distribution = case
+
+    if distribution == 'uniform':
+        return f'I{I_size}_J{J_size}_p{p}_r{radius}_m{max_value}'
+
+    return f'I{I_size}_J{J_size}_p{p}_r{radius}_m{max_value}_{distribution}'
+
+
+def generate_case(case, seed):
+    """
+    Instance of a benchmark case
+    INPUT:
+      case => (I, J, p, radius, max_value, distribution)
+      seed => Seed of the instance
+    RETURN:
+      population_coordinates, candidate_sites_coordinates => (n, 2) arrays
+    """
+    I_size, J_size, p, radius, max_value, distribution = case
+
+    if distribution == 'uniform':
+        np.random.seed(seed)
+        population_coordinates = np.random.randint(low=0, high=max_value, size=(I_size, 2))
+        candidate_sites_coordinates = generate_candidate_sites(population_coordinates, J_size)
+
+        return population_coordinates, candidate_sites_coordinates
+
+    random_generator = np.random.default_rng(seed)
+    model = population_model(random_generator, 0, max_value, distribution)
+    population_coordinates = sample_population(random_generator, model, I_size)
+    candidate_sites_coordinates = generate_candidate_sites(population_coordinates, J_size, random_generator=random_generator)
+
+    return population_coordinates, candidate_sites_coordinates
+
+
+def run_phases(population_coordinates, candidate_sites_coordinates, p, radius, local_search_mode):
+    """
+    Run every phase once
+    RETURN:
+      phases_times => {phase: seconds}
+      objective => {'ch': value, 'ls': value, 'ga': value}
+    """
+    phases_times = {}
+    name = 'benchmark'
+
+    # Solver output isn't part of the measure
+    with contextlib.redirect_stdout(io.StringIO()):
+        time_start = time.perf_counter()
+        coverage = build_coverage(population_coordinates, candidate_sites_coordinates, radius)
+        phases_times['coverage'] = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        ch_data = mclp_ch(population_coordinates, candidate_sites_coordinates, p, radius, name, coverage)
+        phases_times['ch'] = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        ls_objF_sites, ls_objF_value = mclp_ls(ch_data[0], ch_data[1], ch_data[2], coverage, local_search_mode)
+        phases_times['ls'] = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        ga_data = mclp_ga(population_coordinates, candidate_sites_coordinates, p, radius, name, coverage)
+        phases_times['ga'] = time.perf_counter() - time_start
+
+    objective = {'ch': int(ch_data[0]), 'ls': int(ls_objF_value), 'ga': int(ga_data[0])}
+
+    return phases_times, objective
+
+
+def peak_memory(population_coordinates, candidate_sites_coordinates, p, radius, local_search_mode):
+    """
+    Peak traced memory of each phase (tracemalloc, numpy allocations included)
+    RETURN:
+      {phase: bytes}
+    """
+    phases_memory = {}
+    name = 'benchmark'
+
+    def traced(phase, function, *arguments):
+        tracemalloc.start()
+        output = function(*arguments)
+        phases_memory[phase] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return output
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        coverage = traced('coverage', build_coverage, population_coordinates, candidate_sites_coordinates, radius)
+        ch_data = traced('ch', mclp_ch, population_coordinates, candidate_sites_coordinates, p, radius, name, coverage)
+        traced('ls', mclp_ls, ch_data[0], ch_data[1], ch_data[2], coverage, local_search_mode)
+        traced('ga', mclp_ga, population_coordinates, candidate_sites_coordinates, p, radius, name, coverage)
+
+    return phases_memory
+
+
+def run_case(case, seed, repetitions, local_search_mode):
+    """
+    Time every phase of a case over several repetitions
+    INPUT:
+      case => (I, J, p, radius, max_value, distribution)
+      seed => Seed of the instance
+      repetitions => Number of timed runs
+      local_search_mode => Swap strategy of the local search
+    RETURN:
+      Case result (dict, see OUTPUT)
+    """
+    I_size, J_size, p, radius, max_value, distribution = case
+    name = case_name(case)
+
+    print(f"\n[*] Case {name} (seed {seed})...")
+    population_coordinates, candidate_sites_coordinates = generate_case(case, seed)
+
+    phases_times = {phase: [] for phase in PHASES}
+    objective = None
+
+    for repetition in range(repetitions):
+        repetition_times, repetition_objective = run_phases(population_coordinates, candidate_sites_coordinates, p, radius, local_search_mode)
+
+        for phase in PHASES:
+            phases_times[phase].append(repetition_times[phase])
+
+        if objective is not None and repetition_objective != objective:
+            print(f"[-] Warning: objective function changed between repetitions ({objective} => {repetition_objective})")
+        objective = repetition_objective
+
+    phases_memory = peak_memory(population_coordinates, candidate_sites_coordinates, p, radius, local_search_mode)
+
+    phases = {}
+    for phase in PHASES:
+        times = np.array(phases_times[phase])
+        phases[phase] = {
+            'median': float(np.median(times)),
+            'p10': float(np.percentile(times, 10)),
+            'p90': float(np.percentile(times, 90)),
+            'peak_memory': int(phases_memory[phase]),
+        }
+        print(f"[+] {phase.upper()} => median {phases[phase]['median']:.4f}s, p90 {phases[phase]['p90']:.4f}s, peak memory {phases[phase]['peak_memory'] / 1024 / 1024:.1f} MB")
+
+    print(f"[+] Objective Function => CH: {objective['ch']}, LS: {objective['ls']}, GA: {objective['ga']}")
+
+    return {
+        'name': name,
+        'seed': seed,
+        'I': I_size,
+        'J': J_size,
+        'p': p,
+        'radius': radius,
+        'max_value': max_value,
+        'distribution': distribution,
+        'phases': phases,
+        'objective': objective,
+    }
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """
+    Flag the phases slower or using more memory than the baseline, and changed objective functions
+    INPUT:
+      results => Results of this run
+      baseline => Results of a previous run
+      tolerance => Allowed growth over the baseline (0.2 = 20%)
+    RETURN:
+      Number of regressions
+    """
+    print(f"\n[*] Comparing against baseline (tolerance {tolerance:.0%})...")
+
+    baseline_cases = {case['name']: case for case in baseline['cases']}
+    regressions = 0
+
+    for case in results['cases']:
+        baseline_case = baseline_cases.get(case['name'])
+
+        if baseline_case is None:
+            print(f"[*] {case['name']} => not in baseline")
+            continue
+
+        if baseline_case['seed'] != case['seed']:
+            print(f"[*] {case['name']} => baseline used another seed, objective functions not compared")
+        elif case['objective'] != baseline_case['objective']:
+            print(f"[-] REGRESSION {case['name']} => objective function {baseline_case['objective']} => {case['objective']}")
+            regressions += 1
+
+        for phase in PHASES:
+            if phase not in baseline_case['phases']:
+                continue
+
+            current = case['phases'][phase]
+            previous = baseline_case['phases'][phase]
+
+            for measure in ['median', 'peak_memory']:
+                if previous[measure] <= 0:
+                    continue
+
+                if measure == 'median' and current[measure] - previous[measure] < MIN_TIME_DIFFERENCE:
+                    continue
+
+                ratio = current[measure] / previous[measure]
+                if ratio > 1 + tolerance:
+                    print(f"[-] REGRESSION {case['name']} {phase} {measure} => {previous[measure]} => {current[measure]} ({ratio:.2f}x)")
+                    regressions += 1
+
+    return regressions
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,565 @@
+"""
+MCLP COVERAGE INDEX
+*********************************************
+Sparse site -> covered nodes structure shared by every MCLP solver.
+
+    INPUT:
+        * population_points
+        * candidate_sites_points
+        * radius
+
+    OUTPUT:
+        * coverage => CSR matrix of shape (J, I)
+            coverage[j] <== ['i' nodes covered by site 'j']
+            coverage.indices[coverage.indptr[j]:coverage.indptr[j+1]] <== covered nodes of site 'j'
+
+NOTE: A node 'i' is covered by a site 'j' when int(distance(i, j)) <= radius, the same
+rule used by the old dense boolean matrix. Only covered pairs are stored, so memory
+and time scale with the number of covered pairs instead of I*J.
+
+    BUILDERS:
+        * build_coverage => KD-tree radius query (default)
+        * build_coverage_tiled => Streams the population in row tiles (--tile-size), peak
+          memory bounded by tile_size * J distances. Used by build_coverage (and by
+          build_sorted_neighbors for the radius sweep) once configure_coverage(tile_size) is called.
+
+    FIRST-COME ASSIGNMENT:
+        * first_come_assignment => Each covered node assigned to the lowest index site covering it
+          (individual covered nodes of the Constructive Heuristic)
+
+    PACKED COVERAGE:
+        * covered_bits => uint64 array (ceil(I/64)), bitset of the nodes covered by a solution.
+          Only the rows of the selected sites are packed, so a bitset costs I / 8 bytes.
+            objective(solution) <== popcount(OR of the packed rows of the sites in solution)
+            gain(j) <== popcount(packed coverage[j] AND NOT covered_bits), over the words of coverage[j]
+        * coverage_bits => uint64 array (J, ceil(I/64)), every site packed, only used by the
+          subset checks of the dominance reduction (--reduce)
+
+    DEMAND AGGREGATION:
+        * aggregate_demand => Identical (or grid-snapped) demand points merged into weighted nodes
+            objective(solution) <== sum of weights of the covered nodes
+
+    DOMINANCE REDUCTION:
+        * reduce_dominated_sites => Sites covering a subset of another site's nodes are removed
+            site_map[k] <== original index of the reduced site 'k'
+
+    RADIUS SWEEP:
+        * neighbors => Pairs up to the largest radius, sorted per site by distance
+            coverage(radius) <== first neighbors of each site with int(distance) <= radius
+*********************************************
+"""
+
+import numpy as np
+
+from mclp_profile import phase
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+
+
+# Population rows per tile of build_coverage_tiled, None to use the KD-tree query (see configure_coverage)
+COVERAGE_TILE_SIZE = None
+
+# Number of set bits of every possible byte value
+POPCOUNT_TABLE = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def configure_coverage(tile_size=None):
+    """
+    Select the coverage builder used by build_coverage in this process
+    INPUT:
+      tile_size => Stream the population in tiles of tile_size rows, None for the KD-tree query
+    """
+    global COVERAGE_TILE_SIZE
+
+    COVERAGE_TILE_SIZE = tile_size
+
+
+def coverage_configuration():
+    """
+    RETURN:
+      tile_size => Argument of configure_coverage, to configure worker processes
+    """
+    return COVERAGE_TILE_SIZE
+
+
+def build_coverage(population_points, candidate_sites_points, radius):
+    """
+    Compute the sparse coverage structure with a KD-tree radius query
+    INPUT:
+      population_points => List/array of demand coordinates (set I)
+      candidate_sites_points => List/array of candidate sites coordinates (set J)
+      radius => Service radius of each site
+    RETURN:
+      coverage CSR matrix (J x I), rows are sites and columns are covered nodes
+    """
+    if COVERAGE_TILE_SIZE is not None:
+        return build_coverage_tiled(population_points, candidate_sites_points, radius, COVERAGE_TILE_SIZE)
+
+    with phase('distance'):
+        sites, nodes, distances, I_size, J_size = radius_pairs(population_points, candidate_sites_points, radius)
+
+    with phase('coverage'):
+        return coverage_from_pairs(sites, nodes, I_size, J_size)
+
+
+def build_coverage_tiled(population_points, candidate_sites_points, radius, tile_size=4096):
+    """
+    Compute the sparse coverage structure streaming the population in row tiles
+    INPUT:
+      population_points => List/array of demand coordinates (set I)
+      candidate_sites_points => List/array of candidate sites coordinates (set J)
+      radius => Service radius of each site
+      tile_size => Population rows per tile, peak memory is about tile_size * J * 8 bytes
+    RETURN:
+      coverage CSR matrix (J x I), same as build_coverage
+    """
+    with phase('distance'):
+        sites, nodes, distances, I_size, J_size = radius_pairs_tiled(population_points, candidate_sites_points, radius, tile_size)
+
+    with phase('coverage'):
+        return coverage_from_pairs(sites, nodes, I_size, J_size)
+
+
+def radius_pairs_tiled(population_points, candidate_sites_points, radius, tile_size=4096):
+    """
+    (site, node) pairs with int(distance) <= radius, streaming the population in row tiles
+    INPUT:
+      population_points => List/array of demand coordinates (set I)
+      candidate_sites_points => List/array of candidate sites coordinates (set J)
+      radius => Service radius of each site
+      tile_size => Population rows per tile, peak memory is about tile_size * J * 8 bytes
+    RETURN:
+      sites, nodes, distances => Arrays of covered pairs and their int(distance), same as radius_pairs
+      I_size, J_size => Number of demand nodes and candidate sites
+
+    Each tile computes squared distances against all sites, is thresholded right away
+    and only its covered pairs are kept.
+    """
+    population_points = np.asarray(population_points).reshape(-1, 2)
+    candidate_sites_points = np.asarray(candidate_sites_points, dtype=float).reshape(-1, 2)
+
+    I_size = population_points.shape[0]
+    J_size = candidate_sites_points.shape[0]
+    tile_size = max(1, int(tile_size))
+
+    # int(distance) <= radius  <==>  distance² < (floor(radius) + 1)²
+    squared_limit = (np.floor(radius) + 1) ** 2
+
+    sites_x = candidate_sites_points[:, 0]
+    sites_y = candidate_sites_points[:, 1]
+
+    tiles_sites = [np.empty(0, dtype=np.int64)]
+    tiles_nodes = [np.empty(0, dtype=np.int64)]
+    tiles_distances = [np.empty(0, dtype=np.int64)]
+
+    for tile_start in range(0, I_size, tile_size):
+        tile = np.asarray(population_points[tile_start:tile_start+tile_size], dtype=float)
+
+        squared_distances = (tile[:, 0, np.newaxis] - sites_x) ** 2
+        squared_distances += (tile[:, 1, np.newaxis] - sites_y) ** 2
+
+        # Keep candidates of the tile, then apply the exact int(distance) rule to them
+        nodes, sites = np.nonzero(squared_distances < squared_limit)
+        distances = np.sqrt(squared_distances[nodes, sites]).astype(np.int64)
+        covered = distances <= radius
+
+        tiles_nodes.append(nodes[covered] + tile_start)
+        tiles_sites.append(sites[covered])
+        tiles_distances.append(distances[covered])
+
+    return np.concatenate(tiles_sites), np.concatenate(tiles_nodes), np.concatenate(tiles_distances), I_size, J_size
+
+
+def radius_pairs(population_points, candidate_sites_points, radius):
+    """
+    (site, node) pairs with int(distance) <= radius, from a KD-tree radius query
+    INPUT:
+      population_points => List/array of demand coordinates (set I)
+      candidate_sites_points => List/array of candidate sites coordinates (set J)
+      radius => Service radius of each site
+    RETURN:
+      sites, nodes, distances => Arrays of covered pairs and their int(distance)
+      I_size, J_size => Number of demand nodes and candidate sites
+    """
+    population_points = np.asarray(population_points, dtype=float).reshape(-1, 2)
+    candidate_sites_points = np.asarray(candidate_sites_points, dtype=float).reshape(-1, 2)
+
+    I_size = population_points.shape[0]
+    J_size = candidate_sites_points.shape[0]
+
+    if I_size == 0 or J_size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, I_size, J_size
+
+    # int(distance) <= radius  <==>  distance < floor(radius) + 1
+    max_distance = np.floor(radius) + 1
+
+    sites_tree = cKDTree(candidate_sites_points)
+    population_tree = cKDTree(population_points)
+
+    pairs = sites_tree.sparse_distance_matrix(population_tree, max_distance, output_type='ndarray')
+    distances = pairs['v'].astype(np.int64)
+    covered = distances <= radius
+
+    return pairs['i'][covered], pairs['j'][covered], distances[covered], I_size, J_size
+
+
+def coverage_from_pairs(sites, nodes, I_size, J_size):
+    """
+    Build the CSR coverage structure from (site, node) covered pairs
+    INPUT:
+      sites => Array of site indexes
+      nodes => Array of node indexes covered by sites[k]
+      I_size => Number of demand nodes
+      J_size => Number of candidate sites
+    RETURN:
+      coverage CSR matrix (J x I) with sorted node indexes per site
+    """
+    data = np.ones(len(sites), dtype=np.int8)
+    coverage = csr_matrix((data, (sites, nodes)), shape=(J_size, I_size))
+    coverage.sum_duplicates()
+    coverage.sort_indices()
+
+    return coverage
+
+
+def coverage_from_arrays(indptr, indices, shape):
+    """
+    Rebuild the CSR coverage structure from its index arrays (e.g. read from a cache)
+    INPUT:
+      indptr => Site 'j' covered nodes are indices[indptr[j]:indptr[j+1]]
+      indices => Covered node indexes, sorted per site
+      shape => (J, I)
+    RETURN:
+      coverage CSR matrix (J x I)
+    """
+    data = np.ones(len(indices), dtype=np.int8)
+
+    return csr_matrix((data, indices, indptr), shape=tuple(shape))
+
+
+def site_covered_nodes(coverage, site):
+    """
+    Nodes covered by a site, as a view over the CSR arrays
+    INPUT:
+      coverage => CSR coverage matrix
+      site => Site index
+    RETURN:
+      Array of covered node indexes
+    """
+    return coverage.indices[coverage.indptr[site]:coverage.indptr[site+1]]
+
+
+def first_come_assignment(coverage):
+    """
+    Assign every covered node to the first site (lowest index) that covers it
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+    RETURN:
+      sites_with_covered_nodes => Dict {site: array of nodes INDIVIDUALLY covered by site}
+
+    Array version of:
+        for site in coverage:
+            for node in site:
+                if node not in current_covered_nodes: assign node to site
+    """
+    J_size, I_size = coverage.shape
+
+    # Lowest site index covering each node (J_size => node not covered)
+    sites = np.repeat(np.arange(J_size), np.diff(coverage.indptr))
+    first_site = np.full(I_size, J_size, dtype=np.int64)
+    np.minimum.at(first_site, coverage.indices, sites)
+
+    # Group nodes by their assigned site, keeping nodes in ascending order
+    nodes_by_site = np.argsort(first_site, kind='stable')
+    split_points = np.searchsorted(first_site[nodes_by_site], np.arange(1, J_size+1))
+    site_nodes = np.split(nodes_by_site, split_points)
+
+    return {site: site_nodes[site] for site in range(J_size)}
+
+
+def pack_coverage(coverage):
+    """
+    Pack the coverage structure into one bitset row per candidate site
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+    RETURN:
+      coverage_bits => uint64 array (J x ceil(I/64)), bit 'i' of row 'j' is set if site 'j' covers node 'i'
+    """
+    J_size, I_size = coverage.shape
+    words = (I_size + 63) // 64
+
+    coverage_bits = np.zeros((J_size, words), dtype=np.uint64)
+
+    sites = np.repeat(np.arange(J_size), np.diff(coverage.indptr))
+    nodes = coverage.indices.astype(np.uint64)
+    np.bitwise_or.at(coverage_bits, (sites, nodes >> np.uint64(6)), np.uint64(1) << (nodes & np.uint64(63)))
+
+    return coverage_bits
+
+
+def coverage_union(coverage, sites):
+    """
+    Nodes covered by a set of sites, packing only their rows
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+      sites => List of site indexes
+    RETURN:
+      covered_bits => uint64 bitset (ceil(I/64)) of the nodes covered by at least one site
+    """
+    covered_bits = np.zeros((coverage.shape[1] + 63) // 64, dtype=np.uint64)
+
+    sites = list(sites)
+    if len(sites) > 0:
+        mark_nodes(covered_bits, np.concatenate([site_covered_nodes(coverage, site) for site in sites]))
+
+    return covered_bits
+
+
+def objective_value(coverage, sites, weights=None):
+    """
+    Objective function (covered population) of a solution
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+      sites => List of selected site indexes
+      weights => Optional demand of each node (see aggregate_demand), 1 per node if None
+    RETURN:
+      Number of nodes (or total demand) covered by the selected sites
+    """
+    covered_bits = coverage_union(coverage, sites)
+
+    if weights is None:
+        return popcount(covered_bits)
+
+    return int(weights[unpack_bits(covered_bits, len(weights))].sum())
+
+
+def marginal_gain(covered_bits, nodes, weights=None):
+    """
+    Demand a site would add to a solution
+    INPUT:
+      covered_bits => Bitset of the nodes covered by the solution (see coverage_union)
+      nodes => Sorted covered nodes of the site (a CSR row, see site_covered_nodes)
+      weights => Optional demand of each node, 1 per node if None
+    RETURN:
+      Number of nodes (or demand) of 'nodes' not covered yet
+    """
+    nodes = nodes.astype(np.uint64)
+
+    if weights is None:
+        # Only the words holding the site's nodes: AND NOT + popcount
+        words, words_bits = node_words(nodes)
+        return popcount(words_bits & ~covered_bits[words])
+
+    uncovered = (covered_bits[nodes >> np.uint64(6)] >> (nodes & np.uint64(63))) & np.uint64(1) == 0
+
+    return int(weights[nodes[uncovered]].sum())
+
+
+def mark_nodes(bits, nodes):
+    """
+    Set the bits of some nodes
+    INPUT:
+      bits => uint64 bitset, modified in place
+      nodes => Array of node indexes
+    """
+    nodes = np.asarray(nodes).astype(np.uint64)
+    np.bitwise_or.at(bits, nodes >> np.uint64(6), np.uint64(1) << (nodes & np.uint64(63)))
+
+
+def node_words(nodes):
+    """
+    Sparse bitset of a sorted set of nodes
+    INPUT:
+      nodes => Sorted uint64 array of node indexes
+    RETURN:
+      words => Index of each non-empty word
+      words_bits => Bits of the nodes in each word
+    """
+    words = nodes >> np.uint64(6)
+    bits = np.uint64(1) << (nodes & np.uint64(63))
+
+    if len(nodes) == 0:
+        return words.astype(np.int64), bits
+
+    # Sorted nodes: the nodes of a word are contiguous
+    word_starts = np.flatnonzero(np.concatenate([[True], words[1:] != words[:-1]]))
+
+    return words[word_starts].astype(np.int64), np.bitwise_or.reduceat(bits, word_starts)
+
+
+def popcount(bits):
+    """
+    Count the set bits of a bitset (or of each row of a bitset matrix)
+    INPUT:
+      bits => uint64 array, 1D for a single bitset or 2D for one bitset per row
+    RETURN:
+      Number of set bits (array of counts for 2D input)
+    """
+    bits = np.ascontiguousarray(bits)
+    counts = POPCOUNT_TABLE[bits.view(np.uint8)]
+
+    if bits.ndim == 1:
+        return int(counts.sum())
+
+    return counts.sum(axis=1, dtype=np.int64)
+
+
+def unpack_bits(bits, size):
+    """
+    Boolean mask of a bitset
+    INPUT:
+      bits => uint64 bitset (see coverage_union)
+      size => Number of nodes
+    RETURN:
+      Boolean array, True for the nodes whose bit is set
+    """
+    bytes_view = bits.astype('<u8').view(np.uint8)
+
+    return np.unpackbits(bytes_view, bitorder='little')[:size].astype(bool)
+
+
+def aggregate_demand(population_points, snap=None):
+    """
+    Merge identical (or grid-snapped) demand points into unique weighted nodes
+    INPUT:
+      population_points => List/array of demand coordinates (set I)
+      snap => Optional grid size, points are moved to the nearest multiple of snap before merging
+    RETURN:
+      nodes_points => Coordinates of the unique nodes
+      weights => Number of demand points merged into each node
+    """
+    population_points = np.asarray(population_points).reshape(-1, 2)
+
+    if snap is not None and snap > 0:
+        population_points = np.round(population_points / snap) * snap
+
+    nodes_points, weights = np.unique(population_points, axis=0, return_counts=True)
+
+    return nodes_points, weights.astype(np.int64)
+
+
+def reduce_dominated_sites(coverage, coverage_bits=None):
+    """
+    Remove empty, duplicated and dominated candidate sites from the coverage structure
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+      coverage_bits => Optional packed coverage (see pack_coverage)
+    RETURN:
+      reduced_coverage => CSR coverage matrix of the kept sites
+      site_map => Array, site_map[k] is the original index of the reduced site 'k'
+
+    A site is dominated when its covered nodes are a strict subset of another site's,
+    and duplicated when another site with a lower index covers the same nodes. Any
+    solution using a removed site can swap it for its dominating site without losing
+    coverage, so the optimal coverage is unchanged.
+    """
+    J_size, I_size = coverage.shape
+    sites_sizes = np.diff(coverage.indptr)
+
+    # Empty and duplicated coverage (hash of the sorted covered nodes)
+    unique_sites = []
+    seen_coverage = set()
+    for site in np.flatnonzero(sites_sizes > 0):
+        site_key = site_covered_nodes(coverage, site).tobytes()
+
+        if site_key not in seen_coverage:
+            seen_coverage.add(site_key)
+            unique_sites.append(site)
+
+    if coverage_bits is None:
+        coverage_bits = pack_coverage(coverage)
+
+    # Sites covering each node
+    nodes_coverage = coverage.tocsc()
+    nodes_degrees = np.diff(nodes_coverage.indptr)
+
+    # Strict subsets: a dominating site must cover the rarest node of the site
+    site_map = []
+    for site in unique_sites:
+        nodes = site_covered_nodes(coverage, site)
+        rarest_node = nodes[np.argmin(nodes_degrees[nodes])]
+
+        covering_sites = nodes_coverage.indices[nodes_coverage.indptr[rarest_node]:nodes_coverage.indptr[rarest_node+1]]
+        covering_sites = covering_sites[sites_sizes[covering_sites] > sites_sizes[site]]
+
+        if len(covering_sites) > 0:
+            uncovered_bits = coverage_bits[site] & ~coverage_bits[covering_sites]
+            if np.any(~uncovered_bits.any(axis=1)):
+                continue
+
+        site_map.append(site)
+
+    site_map = np.array(site_map, dtype=np.int64)
+
+    return coverage[site_map], site_map
+
+
+def build_sorted_neighbors(population_points, candidate_sites_points, max_radius):
+    """
+    Neighbors of every site up to the largest radius of a sweep, sorted by distance
+    INPUT:
+      population_points => List/array of demand coordinates (set I)
+      candidate_sites_points => List/array of candidate sites coordinates (set J)
+      max_radius => Largest service radius of the sweep
+    RETURN:
+      neighbors => Dict with
+        'indptr' => Site 'j' neighbors are in [indptr[j], indptr[j+1])
+        'nodes' => Neighbor node indexes, sorted by (site, distance)
+        'keys' => site * stride + int(distance), sorted, used to threshold by radius
+        'stride' => Key stride (larger than any int(distance))
+        'max_radius' => max_radius, coverage_at_radius is valid up to it
+        'shape' => (J, I)
+    """
+    # Tiled distance computation (--tile-size), see configure_coverage
+    if COVERAGE_TILE_SIZE is not None:
+        sites, nodes, distances, I_size, J_size = radius_pairs_tiled(population_points, candidate_sites_points, max_radius, COVERAGE_TILE_SIZE)
+    else:
+        sites, nodes, distances, I_size, J_size = radius_pairs(population_points, candidate_sites_points, max_radius)
+
+    order = np.lexsort((nodes, distances, sites))
+    sites = sites[order].astype(np.int64)
+    nodes = nodes[order]
+    distances = distances[order]
+
+    stride = int(np.floor(max_radius)) + 2
+    indptr = np.zeros(J_size+1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(sites, minlength=J_size))
+
+    return {'indptr': indptr,
+            'nodes': nodes,
+            'keys': sites * stride + distances,
+            'stride': stride,
+            'max_radius': max_radius,
+            'shape': (J_size, I_size)}
+
+
+def coverage_at_radius(neighbors, radius):
+    """
+    Coverage structure for a radius <= max_radius, thresholding the sorted neighbors
+    INPUT:
+      neighbors => Output of build_sorted_neighbors
+      radius => Service radius of each site
+    RETURN:
+      coverage CSR matrix (J x I), same as build_coverage(..., radius)
+    """
+    J_size, I_size = neighbors['shape']
+    starts = neighbors['indptr'][:-1]
+
+    # Last neighbor of each site with int(distance) <= radius
+    site_keys = np.arange(J_size, dtype=np.int64) * neighbors['stride'] + int(np.floor(radius))
+    ends = np.searchsorted(neighbors['keys'], site_keys, side='right')
+    lengths = ends - starts
+
+    # Positions of the first 'lengths[j]' neighbors of every site
+    indptr = np.zeros(J_size+1, dtype=np.int64)
+    indptr[1:] = np.cumsum(lengths)
+    positions = np.arange(indptr[-1]) - np.repeat(indptr[:-1] - starts, lengths)
+
+    nodes = neighbors['nodes'][positions]
+    data = np.ones(len(nodes), dtype=np.int8)
+
+    coverage = csr_matrix((data, nodes, indptr), shape=(J_size, I_size))
+    coverage.sort_indices()
+
+    return coverage
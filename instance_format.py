@@ -0,0 +1,208 @@
+"""
+MCLP INSTANCE FORMATS
+*INPUT/OUTPUT:
+    * EXCEL FILES (.xlsx):
+        * Sheet 1 -> 'Population' nodes, set i
+        * Sheet 2 -> 'Candidate sites' nodes, set j
+
+    * BINARY FILES (.mclp):
+        * Header (32 bytes) -> magic 'MCLP', version (uint32), I (uint64), J (uint64), padding
+        * Data -> int32 coordinates (I + J, 2), population nodes first, then candidate sites
+        * Loaded with np.memmap, so population and candidate sites are zero-copy views
+
+*CONVERTER:
+    * Input instance file (.xlsx or .mclp) -> -i, --input
+    * Output instance file (.xlsx or .mclp) -> -o, --output
+"""
+
+import numpy as np
+import pandas as pd
+
+from optparse import OptionParser
+
+
+BINARY_EXTENSION = '.mclp'
+BINARY_MAGIC = b'MCLP'
+BINARY_VERSION = 1
+BINARY_HEADER_SIZE = 32
+BINARY_DTYPE = np.int32
+
+
+def main():
+    get_input = getInput()
+
+    options = get_input[0]
+    arguments = get_input[1]
+
+    if options.input is None or options.output is None:
+        print("[*] Use 'instance_format.py -h' to get information of use.")
+        exit()
+
+    print(f"[*] Converting {options.input} => {options.output}...")
+    population_coordinates, candidate_sites_coordinates = read_instance(options.input)
+    write_instance(options.output, population_coordinates, candidate_sites_coordinates)
+    print("[+] Done.")
+
+
+def getInput():
+    parser = OptionParser()
+    parser.add_option("-i", "--input",
+                      dest="input",
+                      help="String value - Instance file to convert (.xlsx or .mclp).",
+                      type=str)
+    parser.add_option("-o", "--output",
+                      dest="output",
+                      help="String value - Converted instance file (.xlsx or .mclp).",
+                      type=str)
+    (options, args) = parser.parse_args()
+
+    return options, args
+
+
+def is_binary_instance(file):
+    return str(file).endswith(BINARY_EXTENSION)
+
+
+def read_instance(file):
+    """
+    Read an instance file, binary or Excel
+    INPUT:
+      file => Instance file name
+    RETURN:
+      population_coordinates, candidate_sites_coordinates => (n, 2) arrays
+    """
+    if is_binary_instance(file):
+        return read_instance_binary(file)
+
+    return read_instance_xlsx(file)
+
+
+def write_instance(file, population_coordinates, candidate_sites_coordinates):
+    """
+    Write an instance file, binary or Excel depending on the extension
+    INPUT:
+      file => Instance file name
+      population_coordinates => (I, 2) coordinates of the population nodes
+      candidate_sites_coordinates => (J, 2) coordinates of the candidate sites
+    """
+    if is_binary_instance(file):
+        write_instance_binary(file, population_coordinates, candidate_sites_coordinates)
+    else:
+        write_instance_xlsx(file, population_coordinates, candidate_sites_coordinates)
+
+
+def read_instance_xlsx(file):
+    """
+    Read the 'Population' and 'Candidate sites' sheets of an Excel instance
+    INPUT:
+      file => Excel file name
+    RETURN:
+      population_coordinates, candidate_sites_coordinates => (n, 2) arrays
+    """
+    # Open the workbook once and read both sheets
+    sheets = pd.read_excel(f'{file}', sheet_name=["Population", "Candidate sites"])
+    population_df = sheets["Population"]
+    candidate_sites_df = sheets["Candidate sites"]
+
+    population_coordinates = population_df[['x', 'y']].to_numpy()
+    candidate_sites_coordinates = candidate_sites_df[['x', 'y']].to_numpy()
+
+    return population_coordinates, candidate_sites_coordinates
+
+
+def write_instance_xlsx(file, population_coordinates, candidate_sites_coordinates):
+    """
+    Write an Excel instance, population nodes indexed by 'i' and candidate sites by 'j', starting from 1
+    INPUT:
+      file => Excel file name
+      population_coordinates => (I, 2) coordinates of the population nodes
+      candidate_sites_coordinates => (J, 2) coordinates of the candidate sites
+    """
+    population_coordinates = np.asarray(population_coordinates).reshape(-1, 2)
+    candidate_sites_coordinates = np.asarray(candidate_sites_coordinates).reshape(-1, 2)
+
+    # Excel file is saved and closed when the writer exits (pandas 1.x and 2.x+)
+    with pd.ExcelWriter(f'{file}', engine='xlsxwriter') as writer:
+        df = pd.DataFrame({'x': population_coordinates[:, 0], 'y': population_coordinates[:, 1]})
+        df.index.name = 'i'
+        df.index += 1
+        df.to_excel(writer, sheet_name='Population')
+
+        df = pd.DataFrame({'x': candidate_sites_coordinates[:, 0], 'y': candidate_sites_coordinates[:, 1]})
+        df.index.name = 'j'
+        df.index += 1
+        df.to_excel(writer, sheet_name='Candidate sites')
+
+
+def binary_header(I_size, J_size):
+    header = np.zeros(BINARY_HEADER_SIZE, dtype=np.uint8)
+    header[0:4] = np.frombuffer(BINARY_MAGIC, dtype=np.uint8)
+    header[4:8] = np.frombuffer(np.uint32(BINARY_VERSION).tobytes(), dtype=np.uint8)
+    header[8:16] = np.frombuffer(np.uint64(I_size).tobytes(), dtype=np.uint8)
+    header[16:24] = np.frombuffer(np.uint64(J_size).tobytes(), dtype=np.uint8)
+
+    return header.tobytes()
+
+
+def read_binary_header(file):
+    """
+    Read the header of a binary instance
+    INPUT:
+      file => Binary instance file name
+    RETURN:
+      I_size, J_size => Number of population nodes and candidate sites
+    """
+    with open(file, 'rb') as f:
+        header = f.read(BINARY_HEADER_SIZE)
+
+    if len(header) < BINARY_HEADER_SIZE or header[0:4] != BINARY_MAGIC:
+        raise ValueError(f"'{file}' is not a binary MCLP instance")
+
+    version = int(np.frombuffer(header[4:8], dtype=np.uint32)[0])
+    if version != BINARY_VERSION:
+        raise ValueError(f"'{file}' has an unsupported binary instance version ({version})")
+
+    I_size = int(np.frombuffer(header[8:16], dtype=np.uint64)[0])
+    J_size = int(np.frombuffer(header[16:24], dtype=np.uint64)[0])
+
+    return I_size, J_size
+
+
+def read_instance_binary(file):
+    """
+    Memory-map a binary instance
+    INPUT:
+      file => Binary instance file name
+    RETURN:
+      population_coordinates, candidate_sites_coordinates => Read-only int32 (n, 2) views of the file
+    """
+    I_size, J_size = read_binary_header(file)
+
+    if I_size + J_size == 0:
+        empty = np.empty((0, 2), dtype=BINARY_DTYPE)
+        return empty, empty
+
+    coordinates = np.memmap(file, dtype=BINARY_DTYPE, mode='r', offset=BINARY_HEADER_SIZE, shape=(I_size + J_size, 2))
+
+    return coordinates[:I_size], coordinates[I_size:]
+
+
+def write_instance_binary(file, population_coordinates, candidate_sites_coordinates):
+    """
+    Write a binary instance
+    INPUT:
+      file => Binary instance file name
+      population_coordinates => (I, 2) integer coordinates of the population nodes
+      candidate_sites_coordinates => (J, 2) integer coordinates of the candidate sites
+    """
+    population_coordinates = np.asarray(population_coordinates).reshape(-1, 2)
+    candidate_sites_coordinates = np.asarray(candidate_sites_coordinates).reshape(-1, 2)
+
+    with open(file, 'wb') as f:
+        f.write(binary_header(len(population_coordinates), len(candidate_sites_coordinates)))
+        f.write(np.ascontiguousarray(population_coordinates, dtype=BINARY_DTYPE).tobytes())
+        f.write(np.ascontiguousarray(candidate_sites_coordinates, dtype=BINARY_DTYPE).tobytes())
+
+
+if __name__ == '__main__':
+    main()
@@ -7,19 +7,40 @@ MCLP INSTANCE GENERATOR
     * Number of candidate sites to generate -> -c, --candidate-sites
     * Number of instances to generate -> -i, --instances
     * Name of the instances -> -f, --filenames
+    * Format of the instances, 'xlsx' or 'mclp' (binary) -> -F, --format
+    * Seed of the instances (same seed => same instances, for any number of jobs) -> --seed
+    * Number of worker processes -> -j, --jobs
+    * Population rows generated and written per chunk (binary format only) -> -C, --chunk-size
+    * Distribution of the population -> -D, --distribution
+        * uniform => Uniform points in the [min, max) square (default)
+        * clusters => Gaussian mixture of equally sized clusters
+        * cities => Gaussian mixture with power-law city sizes, the k-th city has a share of
+          the population proportional to k^-alpha (a few dense cities, many small towns)
+        * grid => Cities snapped to a grid, many points share the same coordinates
+    * Number of clusters/cities -> -k, --clusters
+    * Standard deviation of the clusters (largest city) -> --spread
+    * Exponent of the city sizes -> --alpha
+    * Spacing of the grid -> -g, --grid-size
 
 *OUTPUT:
     * EXCEL FILES:
         * Sheet 1 -> 'Population' nodes, set i
         * Sheet 2 -> 'Candidate sites' nodes, set j
+    * BINARY FILES (see instance_format.py):
+        * int32 population nodes followed by candidate sites, memory-mappable
+        * With --chunk-size the population is streamed to the file chunk by chunk, and the
+          convex hull of the candidate sites is merged from the hull of each chunk, so memory
+          doesn't grow with the size of the population
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import Workbook
 from openpyxl import load_workbook
 import numpy as np
 from optparse import OptionParser
-import pandas as pd
+
+from instance_format import BINARY_DTYPE, binary_header, write_instance
 
 
 def main():
@@ -28,13 +49,17 @@ def main():
     options = get_input[0]
     arguments = get_input[1]
 
-    options_dict = vars(options)
-    options_values = options_dict.values()
+    required_values = [options.size, options.min_value, options.max_value,
+                       options.candidate_sites, options.instances, options.filenames]
 
-    if None in options_values:
+    if None in required_values:
         print("[*] Use 'instance_generator -h' to get information of use.")
         exit()
 
+    if options.chunk_size is not None and options.format != 'mclp':
+        print("[-] Error: '--chunk-size' streams to binary instances only, use '-F mclp'.")
+        exit()
+
     try:
         size = options.size
         instances = options.instances
@@ -42,13 +67,23 @@ def main():
         min_value = options.min_value
         max_value = options.max_value
         number_candidate_sites = options.candidate_sites
+        instances_format = options.format
+        seed = options.seed
+        jobs = options.jobs
+        chunk_size = options.chunk_size
+        distribution = {'distribution': options.distribution,
+                        'clusters': options.clusters,
+                        'spread': options.spread,
+                        'alpha': options.alpha,
+                        'grid_size': options.grid_size}
 
         print(f"[*] Population/nodes to generate: {size}")
         print(f"[*] Instances to generate: {instances}")
-        print(f"[*] Format of the filenames: {filenames}<size>_<instance>.xlsx")
+        print(f"[*] Distribution of the population: {options.distribution}")
+        print(f"[*] Format of the filenames: {filenames}<size>_<instance>.{instances_format}")
 
         print("\n[*] Generating instances...")
-        generate(size, instances, filenames, min_value, max_value, number_candidate_sites)
+        generate(size, instances, filenames, min_value, max_value, number_candidate_sites, instances_format, seed, jobs, chunk_size, distribution)
         print("\n[+] Done.")
 
     except ValueError:
@@ -85,12 +120,56 @@ def getInput():
                       dest="filenames",
                       help="String value - Name of the instances",
                       type=str)
+    parser.add_option("-F", "--format",
+                      dest="format",
+                      help="String value - Format of the instances: 'xlsx' (Excel) or 'mclp' (binary). Default: xlsx.",
+                      type="choice",
+                      choices=["xlsx", "mclp"],
+                      default="xlsx")
+    parser.add_option("--seed",
+                      dest="seed",
+                      help="INT value - Seed of the instances, the same seed generates the same instances. Default: random (printed).",
+                      type=int)
+    parser.add_option("-j", "--jobs",
+                      dest="jobs",
+                      help="INT value - Number of worker processes generating instances. Default: 1.",
+                      type=int,
+                      default=1)
+    parser.add_option("-C", "--chunk-size",
+                      dest="chunk_size",
+                      help="INT value - Generate and write the population in chunks of this many points (constant memory, '-F mclp' only). Default: whole population at once.",
+                      type=int)
+    parser.add_option("-D", "--distribution",
+                      dest="distribution",
+                      help="String value - Distribution of the population: 'uniform', 'clusters' (Gaussian mixture), 'cities' (power-law city sizes) or 'grid' (cities snapped to a grid). Default: uniform.",
+                      type="choice",
+                      choices=["uniform", "clusters", "cities", "grid"],
+                      default="uniform")
+    parser.add_option("-k", "--clusters",
+                      dest="clusters",
+                      help="INT value - Number of clusters/cities. Default: 10.",
+                      type=int,
+                      default=10)
+    parser.add_option("--spread",
+                      dest="spread",
+                      help="FLOAT value - Standard deviation of the clusters (of the largest city). Default: (max - min) / 20.",
+                      type=float)
+    parser.add_option("--alpha",
+                      dest="alpha",
+                      help="FLOAT value - Exponent of the power-law city sizes. Default: 1.0.",
+                      type=float,
+                      default=1.0)
+    parser.add_option("-g", "--grid-size",
+                      dest="grid_size",
+                      help="INT value - Spacing of the population grid ('grid' distribution). Default: 10.",
+                      type=int,
+                      default=10)
     (options, args) = parser.parse_args()
 
     return options, args
 
 
-def generate(size, instances, filenames, min_value, max_value, number_candidate_sites):
+def generate(size, instances, filenames, min_value, max_value, number_candidate_sites, instances_format='xlsx', seed=None, jobs=1, chunk_size=None, distribution=None):
     try:
         folder = f'{filenames}_instances'
         os.mkdir(folder)
@@ -102,75 +181,266 @@ def generate(size, instances, filenames, min_value, max_value, number_candidate_
         else:
             pass
 
-    for i in range(1, instances+1):
-        # Create excel file 
-        filename = f'{filenames}{size}_{i}.xlsx'
-        print(f"\n[*] Creating {filename}...")
-        writer = pd.ExcelWriter(f'{folder}/{filename}', engine='xlsxwriter')
-        
-        # Generate and write population data on excel file
-        print(f"[*] Generating and writing population data on {filename}...")
-        data_population = np.random.randint(low=min_value, high=max_value, size=(size, 2))
-        data_population_x = [coord[0] for coord in data_population]
-        data_population_y = [coord[1] for coord in data_population]
-
-        df = pd.DataFrame({'x': data_population_x, 'y': data_population_y})
-        df.index.name = 'i'
-        df.index += 1
-        df.to_excel(writer, sheet_name='Population')
-
-        # Generate and write candidate sites data on excel file
-        print(f"[*] Writing candidate sites data on {filename}...")
-        data_candidate_sites = generate_candidate_sites(data_population, number_candidate_sites)
-        data_candidate_sites_x = [coord[0] for coord in data_candidate_sites]
-        data_candidate_sites_y = [coord[1] for coord in data_candidate_sites]
-
-        df = pd.DataFrame({'x': data_candidate_sites_x, 'y': data_candidate_sites_y})
-        df.index.name = 'j'
-        df.index += 1
-        df.to_excel(writer, sheet_name='Candidate sites')
-
-        # Save Excel file and close it
-        writer.save()
-
-
-def generate_candidate_sites(coordinates, S):
+    # Independent child seed of each instance, so the instances don't depend on the number of jobs
+    seed_sequence = np.random.SeedSequence(seed)
+    print(f"[*] Seed: {seed_sequence.entropy}")
+    instances_seeds = seed_sequence.spawn(instances)
+
+    instances_arguments = [(folder, f'{filenames}{size}_{i}.{instances_format}', size, min_value, max_value, number_candidate_sites, instances_seeds[i-1], chunk_size, distribution)
+                           for i in range(1, instances+1)]
+
+    if jobs <= 1:
+        for arguments in instances_arguments:
+            generate_instance(*arguments)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(generate_instance, *arguments) for arguments in instances_arguments]
+
+        for future in futures:
+            future.result()
+
+
+def generate_instance(folder, filename, size, min_value, max_value, number_candidate_sites, instance_seed, chunk_size=None, distribution=None):
+    """
+    Generate and write one instance file
+    INPUT:
+      folder => Directory of the instance file
+      filename => Name of the instance file
+      size => Size of population
+      min_value, max_value => Range of the population coordinates
+      number_candidate_sites => Number of candidate sites
+      instance_seed => np.random.SeedSequence of the instance
+      chunk_size => Stream the population to a binary file in chunks of this size (see generate_instance_chunked)
+      distribution => Keyword arguments of population_model, uniform if None
+    """
+    random_generator = np.random.default_rng(instance_seed)
+    model = population_model(random_generator, min_value, max_value, **(distribution or {}))
+
+    # Create instance file
+    print(f"\n[*] Creating {filename}...")
+
+    if chunk_size is not None:
+        generate_instance_chunked(f'{folder}/{filename}', size, model, number_candidate_sites, random_generator, chunk_size)
+        return
+
+    # Generate population data
+    print(f"[*] Generating population data on {filename}...")
+    data_population = sample_population(random_generator, model, size)
+
+    # Generate candidate sites data
+    print(f"[*] Generating candidate sites data on {filename}...")
+    data_candidate_sites = generate_candidate_sites(data_population, number_candidate_sites, random_generator=random_generator)
+
+    # Write population and candidate sites data on instance file
+    print(f"[*] Writing {filename}...")
+    write_instance(f'{folder}/{filename}', data_population, data_candidate_sites)
+
+
+def generate_instance_chunked(file, size, model, number_candidate_sites, random_generator, chunk_size):
+    """
+    Generate a binary instance streaming the population to the file chunk by chunk
+    INPUT:
+      file => Binary instance file name
+      size => Size of population
+      model => Distribution of the population (see population_model)
+      number_candidate_sites => Number of candidate sites
+      random_generator => np.random.Generator of the instance
+      chunk_size => Population points generated and written at a time
+
+    Only one chunk and the vertices of the hull so far are kept in memory. The hull of the
+    population is the hull of (hull so far + chunk), so candidate sites are sampled from the
+    same hull. For the uniform distribution the file is the same as generating the whole
+    population at once.
+    """
+    chunk_size = max(1, int(chunk_size))
+    hull_points = np.empty((0, 2), dtype=np.int64)
+
+    with open(file, 'wb') as f:
+        f.write(binary_header(size, number_candidate_sites))
+
+        # Generate and write population data
+        print(f"[*] Generating population data on {file} ({chunk_size} points per chunk)...")
+        for chunk_start in range(0, size, chunk_size):
+            chunk = sample_population(random_generator, model, min(chunk_size, size - chunk_start))
+            np.ascontiguousarray(chunk, dtype=BINARY_DTYPE).tofile(f)
+
+            hull_points = hull_vertices(np.concatenate([hull_points, chunk]))
+
+        # Generate and write candidate sites data
+        print(f"[*] Generating candidate sites data on {file}...")
+        data_candidate_sites = generate_candidate_sites(hull_points, number_candidate_sites, random_generator=random_generator)
+        np.ascontiguousarray(data_candidate_sites, dtype=BINARY_DTYPE).tofile(f)
+
+
+def population_model(random_generator, min_value, max_value, distribution='uniform', clusters=10, spread=None, alpha=1.0, grid_size=10):
+    """
+    Parameters of the population distribution of an instance (cluster centers, sizes and spreads)
+    INPUT:
+      random_generator => np.random.Generator of the instance
+      min_value, max_value => Range of the population coordinates, [min_value, max_value)
+      distribution => 'uniform', 'clusters', 'cities' or 'grid'
+      clusters => Number of clusters/cities
+      spread => Standard deviation of the clusters (of the largest city), (max - min) / 20 if None
+      alpha => Exponent of the city sizes, share of the k-th city ~ k^-alpha
+      grid_size => Spacing of the grid ('grid')
+    RETURN:
+      model dict, to draw points with sample_population
+
+    Cities are Gaussian clusters whose share of the population follows a power law. Their
+    spread grows with the fourth root of their share, so larger cities are both wider and
+    denser than small towns.
+    """
+    model = {'distribution': distribution, 'min_value': min_value, 'max_value': max_value}
+
+    if distribution == 'uniform':
+        return model
+
+    if spread is None:
+        spread = (max_value - min_value) / 20
+
+    clusters = max(1, int(clusters))
+    model['centers'] = random_generator.uniform(min_value, max_value, size=(clusters, 2))
+
+    if distribution == 'clusters':
+        model['weights'] = np.full(clusters, 1 / clusters)
+        model['spreads'] = np.full(clusters, float(spread))
+    else:
+        city_sizes = np.arange(1, clusters + 1, dtype=float) ** -alpha
+        model['weights'] = city_sizes / city_sizes.sum()
+        model['spreads'] = spread * (city_sizes / city_sizes[0]) ** 0.25
+
+    if distribution == 'grid':
+        model['grid_size'] = max(1, int(grid_size))
+
+    return model
+
+
+def sample_population(random_generator, model, size):
+    """
+    Draw population points from a distribution
+    INPUT:
+      random_generator => np.random.Generator of the instance
+      model => Distribution of the population (see population_model)
+      size => Number of points
+    RETURN:
+      (size, 2) integer coordinates in [min_value, max_value)
+    """
+    min_value = model['min_value']
+    max_value = model['max_value']
+
+    if model['distribution'] == 'uniform':
+        return random_generator.integers(low=min_value, high=max_value, size=(size, 2))
+
+    # Gaussian mixture: cluster of each point, then its offset from the cluster center
+    point_clusters = random_generator.choice(len(model['weights']), size=size, p=model['weights'])
+    points = random_generator.normal(size=(size, 2))
+    points *= model['spreads'][point_clusters, np.newaxis]
+    points += model['centers'][point_clusters]
+
+    if model['distribution'] == 'grid':
+        grid_size = model['grid_size']
+        points = min_value + np.round((points - min_value) / grid_size) * grid_size
+
+    points = np.clip(np.floor(points), min_value, max_value - 1)
+
+    return points.astype(np.int64)
+
+
+def hull_vertices(points):
+    """
+    Vertices of the convex hull of some points
+    INPUT:
+      points => (n, 2) array
+    RETURN:
+      (h, 2) array of the hull vertices, the two end points if they have no 2D hull (too few or collinear)
+    """
+    from scipy.spatial import ConvexHull, QhullError
+
+    try:
+        hull = ConvexHull(points)
+    except (QhullError, ValueError):
+        if len(points) == 0:
+            return points
+        order = np.lexsort((points[:, 1], points[:, 0]))
+        return points[[order[0], order[-1]]]
+
+    return points[hull.vertices]
+
+
+def generate_candidate_sites(coordinates, S, batch_size=65536, random_generator=None, max_batch_size=1048576):
     """
     Generate candidate sites inside a convex hull of given coordinates
     INPUT:
       coordinates => List of coordinates to work on
       S => Number of sites to generate
+      batch_size => Minimum number of points drawn per batch
+      random_generator => np.random.Generator to draw from, global np.random state if None
+      max_batch_size => Maximum number of points drawn per batch (bounds memory on thin hulls)
     RETURN:
       candidate_sites list
+
+    Batched rejection sampling: uniform points are drawn in batches over the bounding box
+    of the hull, and kept if they are strictly inside every facet of the hull
+    (normal · point + offset < 0, from ConvexHull.equations). Facets are tested one at a
+    time, so memory stays a few arrays of the batch size whatever the number of facets.
+    Coordinates with no 2D hull (a single point or collinear points) get their sites
+    drawn uniformly on the segment between the two end points.
     """
 
     # From array to numpy array
     coordinates = np.array(coordinates)
 
+    if random_generator is None:
+        random_generator = np.random
+
     # Create convex hull
-    from scipy.spatial import ConvexHull
-    hull = ConvexHull(coordinates)
-
-    # Create polygon points
-    polygon_points = coordinates[hull.vertices]
-    from shapely.geometry import Polygon
-    poly = Polygon(polygon_points)
-    
+    from scipy.spatial import ConvexHull, QhullError
+    try:
+        hull = ConvexHull(coordinates)
+    except (QhullError, ValueError):
+        if len(coordinates) == 0:
+            raise ValueError("candidate sites need at least one population point")
+
+        # Degenerate hull: the segment between the end points (see hull_vertices)
+        start, end = hull_vertices(coordinates)
+        positions = random_generator.uniform(0, 1, S)[:, np.newaxis]
+
+        return (start + positions * (end - start)).astype(int)
+
+    # Facets of the hull: normals (unit, outward) and offsets
+    normals = hull.equations[:, :-1]
+    offsets = hull.equations[:, -1]
+
     # Min and max coordinates bounds
-    min_x, min_y, max_x, max_y = poly.bounds
+    min_x, min_y = coordinates[hull.vertices].min(axis=0)
+    max_x, max_y = coordinates[hull.vertices].max(axis=0)
 
-    # Generate candidate sites
-    from shapely.geometry import Point
-    from numpy import random
+    # Fraction of the bounding box inside the hull (2D hull volume is its area)
+    bounding_box_area = (max_x - min_x) * (max_y - min_y)
+    acceptance = hull.volume / bounding_box_area if bounding_box_area > 0 else 1
 
+    # Generate candidate sites
     sites = []
-    while len(sites) < S:
-        random_point = Point([random.uniform(min_x, max_x),
-                              random.uniform(min_y,max_y)])
-        if (random_point.within(poly)):
-            sites.append(random_point)
+    sites_count = 0
+    while sites_count < S:
+        # Enough points to fill the remaining sites on average, with some margin
+        # (up to max_batch_size, the next batches make up the rest)
+        batch = max(batch_size, int(1.2 * (S - sites_count) / max(acceptance, 1e-6)))
+        batch = min(batch, max(batch_size, max_batch_size))
+        points_x = random_generator.uniform(min_x, max_x, batch)
+        points_y = random_generator.uniform(min_y, max_y, batch)
+
+        inside = np.ones(batch, dtype=bool)
+        for normal, offset in zip(normals, offsets):
+            inside &= normal[0] * points_x + normal[1] * points_y + offset < 0
+
+        accepted_points = np.column_stack([points_x[inside], points_y[inside]])[:S - sites_count]
+
+        sites.append(accepted_points)
+        sites_count += len(accepted_points)
 
-    sites_coordinates = np.array([(site.x,site.y) for site in sites])
+    sites_coordinates = np.concatenate(sites) if sites else np.empty((0, 2))
     sites_coordinates = sites_coordinates.astype(int)
 
     return sites_coordinates
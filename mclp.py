@@ -14,34 +14,27 @@ Greddy Adding Algorithm
             solution <== []
             current_covered_nodes = []
 
-        2. Compute distance matrix
-            dist_matrix <== [Site 'j':[Distance from node 'i' in population_points to site 'j' in candidate_sites_points],...]
+        2. Compute coverage index (KD-tree radius query, see coverage_index.py)
+            coverage <== CSR [Site 'j':['i' nodes with int(distance(i, j)) <= radius],...]
         
-        3. Compute boolean matrix
-            boolean_matrix <== [Site 'j':['i' nodes covered by site 'j'],...]
+        3. Read covered nodes of each site from the coverage index
+            coverage[j] <== ['i' nodes covered by site 'j']
         
-        4. Compute INDIVIDUAL covered nodes by each site in boolean matrix
-            sites_with_covered_nodes = {}
-
-            for site in boolean_matrix:
-                site_covered_nodes = []
-
-                for node in site:
-                    if node not in current_covered_nodes:
-                        site_covered_nodes.append(node)
-                        current_covered_nodes.append(node)
-                    else:
-                        pass
-
-                sites_with_covered_nodes[site] = site_covered_nodes
-
-        5. Pick the site that covers most of the total population
-            # Site whose objective function is the largest
-            site_with_max_population = max(sites_with_covered_nodes, key = lambda k: sites_with_covered_nodes[k])
+        4. Start every site in a max-heap with its total covered nodes as marginal gain
+            heap <== [(len(coverage[j]), j),...]
+            covered_bits <== [0] * ceil(len(population_points) / 64) (uint64 bitset)
+
+        5. Pick the site with the largest marginal gain (lazy evaluation, CELF)
+            gain, site <== pop(heap)
+            if gain was computed in the current round:
+                site_with_max_gain <== site
+            else:
+                gain <== popcount(packed coverage[site] AND NOT covered_bits)
+                push(heap, (gain, site)) and repeat step 5
         
-        6. Add site_with_max_population to solution, and remove it from sites_with_covered_nodes
-            solution <== append(site_with_max_population)
-            sites_with_covered_nodes <== remove(site_with_max_population)
+        6. Add site_with_max_gain to solution, and mark its nodes as covered
+            solution <== append(site_with_max_gain)
+            covered_bits[coverage[site_with_max_gain]] <== 1
         
         7. Repeat step 5, stop until 
             len(solution) === number_sites_to_select
@@ -87,7 +80,7 @@ Constructive Heuristic
                 current_covered_nodes <== compute_covered_nodes(selected_sites)
                 number_of_covered_nodes = len(current_covered_nodes)
 
-                r1 = covered_nodes(boolean_matrix(site)) > 0
+                r1 = covered_nodes(coverage(site)) > 0
                 r2 = len(selected_sites) < number_sites_to_select
                 r3 = number_of_covered_nodes < population_size
 
@@ -107,7 +100,8 @@ Local Search Heuristic
                 -> objF_value = Objective function value
                 -> objF_sites = Objective function sites
             * free_sites = List of current free sites
-            * sites_with_objF = Dict of sites with their objective function
+            * coverage = Coverage index (Site 'j' => ['i' nodes covered by site 'j'])
+            * mode = Swap strategy, 'first' or 'best' improvement, or 'matrix' (batched best improvement)
 
         OUTPUT:
             * LOCAL SEARCH Solution
@@ -116,26 +110,26 @@ Local Search Heuristic
             * Computation time
 
         ALGORITHM:
-            objF_copy = int(objF_value) <== int
-            objF_sites_copy = objF_sites.copy() <== list 
-            free_sites_copy = free_sites.copy() <== list
-            sites_with_objF_copy = sites_with_objF.copy() <== dict
-
-            for i, site in enumerate(objF_sites_copy):
-                site_objF = sites_with_objF_copy[site]
-
-                for free_site in free_sites_copy:
-                    free_site_objF = sites_with_objF_copy[free_site]
-                    
-                    if free_site_objF > site_objF:
-                        objF_sites_copy[i] = free_site
-                        free_sotes_copy.pop(free_site)
-
-                    else:
-                        pass
-            
-            new_sites_set => objF_sites_copy.copy()
-            new_objF_value => compute population covered by new_sites_set
+            coverage_count <== [Number of selected sites covering node 'i',...]
+
+            Repeat until no swap improves the solution (local optimum):
+                gain <== [nodes of coverage[free_site] with coverage_count == 0,...] (every free site at once)
+
+                for site in objF_sites:
+                    drop site => coverage_count[coverage[site]] -= 1
+                    loss <== nodes of coverage[site] with coverage_count == 0
+
+                    delta <== gain - loss + [loss nodes covered by free_site,...] (every free site at once)
+
+                    mode 'first' => apply the first swap with delta > 0
+                    mode 'best' => remember the swap with the largest delta
+
+                    restore site => coverage_count[coverage[site]] += 1
+
+                apply best swap (mode 'best')
+
+            mode 'matrix' => score every (site, free_site) swap at once:
+                delta <== gain[free_site] - loss[site] + (unique_coverage @ free_coverage.T)[site, free_site]
 
             if new_objF_value > objF_copy:
                 return new_objF_value, new_sites_set
@@ -145,9 +139,21 @@ Local Search Heuristic
 *********************************************
 PROGRAM OUTPUT:
 * Objective function of Constructive Heuristic -> Total of the population covered
-* Execution time of the Constructive Heuristic -> cpu_sec_ch
+* Execution time of the Constructive Heuristic -> sec_ch
 * Objective function of Local Search Heuristic -> Total of the population covered IMPROVED
-* Execution time of the Local Search Heuristic -> cpu_sec_ls
+* Execution time of the Local Search Heuristic -> sec_ls
+* Objective function and execution time of the Greedy Adding algorithm (printed only, with --greedy)
+* Time of each phase (read, distance, coverage, construct, local_search, greedy, plot, write), and
+  peak memory with --memory (see mclp_profile.py). --profile writes the cProfile output of each instance.
+* Results are appended to <instances>_results.jsonl (one JSON row per instance, flushed), and the
+  <instances>_results.xlsx workbook and LaTeX table are written once, after the last instance.
+* Batch pipeline (one job): a prefetch thread reads the next instances (--prefetch) while the current
+  one is solved (its read time is still reported), and results and plots are written by background
+  threads. Prefetch is disabled with --profile and --memory.
+*********************************************
+NOTE: Dominance reduction (--reduce) => Before solving, candidate sites covering no node, the same nodes as a
+site with a lower index, or a strict subset of the nodes of another site are removed (see coverage_index.py). The
+best coverage is unchanged, and selected sites are reported with their original Excel index.
 *********************************************
 NOTE: Euclidean distance => AC = sqrt(AB² + BC²) = sqrt( (x2 - x1)² + (y2 - y1)² )
 *********************************************
@@ -160,29 +166,47 @@ by making small movements on it.
 
 # TODO: Plot input/output
 
+import heapq
+import json
 import numpy as np
 import openpyxl
 import os
 import pandas as pd
+import queue
+import threading
 import time
 
-from matplotlib import pyplot as plt
-from numpy import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from coverage_index import aggregate_demand, build_coverage, build_sorted_neighbors, configure_coverage, coverage_configuration, coverage_at_radius, coverage_from_arrays, first_come_assignment, mark_nodes, marginal_gain, objective_value, reduce_dominated_sites, site_covered_nodes
+from instance_format import BINARY_EXTENSION, is_binary_instance, read_instance_binary, read_instance_xlsx
+from mclp_cache import cache_configuration, cache_enabled, configure_cache, file_hash, has_entry, load_arrays, save_arrays
+from mclp_plot import configure_plots, plot_configuration, plot_input, plot_output, wait_plots
+from mclp_profile import PHASES, add_phase_time, configure_profile, phase, phase_times, profile_call, profile_configuration, start_phases
 from openpyxl import load_workbook
 from os import listdir
 from optparse import OptionParser
 
 
+# Extensions of the instance files of a directory
+INSTANCE_EXTENSIONS = ('.xlsx', BINARY_EXTENSION)
+
+
 def main():
     # Get input
     get_input = getInput()
     options = get_input[0]
     arguments = get_input[1]
 
-    options_dict = vars(options)
-    options_values = options_dict.values()
+    required_values = [options.directory]
 
-    if None in options_values:
+    if options.sites is None and options.sites_range is None:
+        required_values.append(None)
+
+    if options.radius is None and options.radii is None:
+        required_values.append(None)
+
+    if None in required_values:
         print("[*] Use 'mclp.py -h' to get information of use.")
         exit()
     
@@ -190,51 +214,165 @@ def main():
     #instances_directory = instances_directory.replace('/','')
     number_of_sites = options.sites
     radius = options.radius
+    local_search_mode = options.local_search
+
+    # Demand aggregation (--aggregate, --snap): duplicated demand points become weighted nodes
+    aggregate = options.aggregate
+    snap = options.snap
+
+    # Dominance reduction (--reduce): dominated candidate sites are removed before solving
+    reduce_sites = options.reduce
+
+    # Greedy Adding (--greedy): also solve each instance with the lazy greedy, after CH and LS
+    greedy = options.greedy
+
+    # Radius sweep (-R): solve every radius from a single distance computation
+    radii = None
+    if options.radii is not None:
+        radii = sorted(set(int(value) for value in options.radii.split(',')))
+
+    # Sites range (--sites-range): solve every p <= P from a single greedy run
+    max_sites = options.sites_range
+    checkpoints = []
+    if options.checkpoints is not None:
+        checkpoints = sorted(set(int(value) for value in options.checkpoints.split(',')))
+
+    if radii is not None and max_sites is not None:
+        print("[-] Error: '-R' and '--sites-range' can't be used together.")
+        exit()
+
+    # Disk cache (--cache-dir)
+    if options.cache_dir is not None:
+        configure_cache(options.cache_dir, options.cache_size * 1024 * 1024)
+
+    # Tiled coverage builder (--tile-size)
+    configure_coverage(options.tile_size)
+
+    # Plots (--plot-dir, --no-plot), rendered to PNG files by a background thread
+    plot_directory = options.plot_dir
 
-    # Process multiple instances
     try:
-        # Sort excel files by modified date
-        instances_directory_list = sorted_ls(instances_directory)
+        try:
+            # Process multiple instances, sorted by modified date
+            instances_directory_list = sorted_ls(instances_directory)
+            instances = [(instance, f'{instances_directory}/{instance}') for instance in instances_directory_list]
+            results_file = f'{instances_directory}_results.xlsx'
+            results_stream_file = f'{instances_directory}_results.jsonl'
+            default_plot_directory = f'{instances_directory}_plots'
+            default_profile_directory = f'{instances_directory}_profile'
+
+        except NotADirectoryError as e:
+            # Process single file instance (outputs named after the file without its extension)
+            instances = [(instances_directory, instances_directory)]
+            instance_stem = os.path.splitext(instances_directory)[0]
+            results_file = f'{instance_stem}_results.xlsx'
+            results_stream_file = f'{instance_stem}_results.jsonl'
+            default_plot_directory = f'{instance_stem}_plots'
+            default_profile_directory = f'{instance_stem}_profile'
+
+        if options.no_plot:
+            plot_directory = None
+        elif plot_directory is None:
+            plot_directory = default_plot_directory
+
+        configure_plots(plot_directory)
+
+        # Instrumentation (--profile, --memory)
+        profile_directory = None
+        if options.profile:
+            profile_directory = default_profile_directory
+        configure_profile(profile_directory, options.memory)
+
+        # Prefetch (--prefetch) reads the next instances while one is profiled or measured: disabled
+        prefetch = options.prefetch
+        if (options.profile or options.memory) and prefetch > 0:
+            print("[*] Prefetch disabled: --profile and --memory measure each instance on its own.")
+            prefetch = 0
 
         # Create dict for each instance
         instances_dict = {}
+        radii_instances_dict = {radius: {} for radius in radii or []}
+        sites_range_dict = {}
+
+        # Solver of each instance file
+        # (and whether it reads the instance: not when every result is memoized, --cache-dir)
+        results_key = demand_key(aggregate, snap) + reduction_key(reduce_sites)
+        if radii is not None:
+            solver = mclp_radius_sweep
+            solver_arguments = lambda instance_file: (number_of_sites, radii, instance_file, local_search_mode, aggregate, snap, reduce_sites, greedy)
+            needs_read = lambda instance_file: not results_cached(instance_file, number_of_sites, radii, local_search_mode, results_key)
+        elif max_sites is not None:
+            solver = mclp_sites_range
+            solver_arguments = lambda instance_file: (max_sites, radius, instance_file, checkpoints, local_search_mode, aggregate, snap, reduce_sites)
+            needs_read = None
+        else:
+            solver = mclp
+            solver_arguments = lambda instance_file: (number_of_sites, radius, instance_file, local_search_mode, aggregate, snap, reduce_sites, greedy)
+            needs_read = lambda instance_file: not results_cached(instance_file, number_of_sites, [radius], local_search_mode, results_key)
+
+        # Results of each instance are appended to a JSON Lines file as soon as they are ready,
+        # by a writer thread (plots have their own rendering thread, see mclp_plot.py)
+        results_stream = open(results_stream_file, 'w')
+        results_writer = ThreadPoolExecutor(max_workers=1)
+        results_futures = []
+
+        # Solve each instance file (in parallel with -j, pipelined with --prefetch)
+        for instance, instance_file, solver_output in solve_instances(solver, solver_arguments, instances, options.jobs, prefetch, needs_read):
+            if radii is not None:
+                # Solve MCLP for every radius
+                radii_results = solver_output
+
+                feasible_radii = []
+                for sweep_radius in radii:
+                    if radii_results[sweep_radius][0] == 0:
+                        print(f"[-] Error: instance {instance_file} problem is not feasible for radius {sweep_radius}.")
+                        continue
+
+                    radii_instances_dict[sweep_radius][instance] = list(radii_results[sweep_radius])
+                    feasible_radii.append(sweep_radius)
+
+                instance_rows = [radii_instances_dict[sweep_radius][instance] for sweep_radius in feasible_radii]
+                stream_rows = [result_row(instance, radii_instances_dict[sweep_radius][instance], radius=sweep_radius) for sweep_radius in feasible_radii]
+
+            elif max_sites is not None:
+                # Solve MCLP for every number of sites up to max_sites
+                sites_range_dict[instance] = solver_output
+                instance_rows = []
+                stream_rows = [sites_range_row(instance, row) for row in solver_output]
 
-        # Read each instance file
-        for instance in instances_directory_list:
-            instance_file = f'{instances_directory}/{instance}'
+            else:
+                # Solve MCLP
+                ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed, phases = solver_output
 
-            # Write results to excel file
-            results_excel = pd.ExcelWriter(f'{instances_directory}_results.xlsx', engine='xlsxwriter')
+                if ch_objF_value == 0:
+                    print(f"[-] Error: instance {instance_file} problem is not feasible.")
+                    continue
 
-            # Solve MCLP
-            ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed = mclp(number_of_sites, radius, instance_file)
+                instances_dict[instance] = [ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed, phases]
+                instance_rows = [instances_dict[instance]]
+                stream_rows = [result_row(instance, instances_dict[instance])]
 
-            instances_dict[instance] = [ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed]
-        
-            # Compute experimental results
-            dataframe = computational_results(instances_dict)
-            dataframe.to_excel(results_excel, sheet_name="Computation results")
+            # Append results of the instance (writer thread)
+            results_futures.append((instance_file, results_writer.submit(write_instance_results, results_stream, stream_rows, instance_rows)))
 
-            results_excel.save()
+        results_writer.shutdown(wait=True)
+        results_stream.close()
 
-        print("\n[+] Done.")
-            
-    # Process single file instance
-    except NotADirectoryError as e:
-        instance_file = f'{instances_directory}'
+        for instance_file, future in results_futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[-] Error: results of instance {instance_file} couldn't be written to {results_stream_file} => {type(e).__name__}: {e}")
 
-        # Write results to excel file
-        results_excel = pd.ExcelWriter(f'{instance_file[:-6]}_results.xlsx', engine='xlsxwriter')
+        print(f"\n[+] Results of each instance written to {results_stream_file}")
 
-        # Solve MCLP
-        ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed = mclp(number_of_sites, radius, instance_file)
-        
-        instances_dict = {}
-        instances_dict[instance_file] = [ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed]
+        # Wait for the plots still being rendered
+        wait_plots()
 
-        dataframe = computational_results(instances_dict)
-        dataframe.to_excel(results_excel, sheet_name="Computation results")
-        results_excel.save()
+        # Write results to excel file (and print the LaTeX table) once, for every instance
+        if len(instances_dict) > 0 or len(sites_range_dict) > 0 or any(len(radius_instances) > 0 for radius_instances in radii_instances_dict.values()):
+            write_results(results_file, instances_dict, radii_instances_dict, sites_range_dict)
+            print(f"[+] Results written to {results_file}")
 
         print("\n[+] Done.")
 
@@ -258,43 +396,541 @@ def getInput():
                       dest="sites",
                       help="INT value - Number of sites to select.",
                       type=int)
+    parser.add_option("--sites-range",
+                      dest="sites_range",
+                      help="INT value - Solve every number of sites p <= P with a single greedy run (replaces -s).",
+                      type=int)
+    parser.add_option("--checkpoints",
+                      dest="checkpoints",
+                      help="STRING value - Comma separated values of p where local search is applied in --sites-range mode (e.g. 5,10,20).",
+                      type=str)
     parser.add_option("-r", "--radius",
                       dest="radius",
                       help="INT value - Service radius of each site.",
                       type=int)
+    parser.add_option("-R", "--radii",
+                      dest="radii",
+                      help="STRING value - Comma separated service radii to sweep (e.g. 10,20,30). Solves every radius from a single distance computation.",
+                      type=str)
     parser.add_option("-d", "--directory",
                       dest="directory",
                       help="STRING value - Folder or file name of the instances to compute.",
                       type=str)
+    parser.add_option("-j", "--jobs",
+                      dest="jobs",
+                      help="INT value - Number of instances to solve in parallel (process pool). Default: 1.",
+                      type=int,
+                      default=1)
+    parser.add_option("--cache-dir",
+                      dest="cache_dir",
+                      help="STRING value - Directory of the disk cache (parsed instances, coverage indexes and results). Disabled by default.",
+                      type=str)
+    parser.add_option("--cache-size",
+                      dest="cache_size",
+                      help="INT value - Size limit of the cache in MB, least recently used entries are evicted. Default: 1024.",
+                      type=int,
+                      default=1024)
+    parser.add_option("--tile-size",
+                      dest="tile_size",
+                      help="INT value - Build coverage streaming the population in tiles of this many rows, bounding peak memory to about tile size * candidate sites * 8 bytes. Default: KD-tree radius query.",
+                      type=int)
+    parser.add_option("--aggregate",
+                      dest="aggregate",
+                      help="Merge identical demand points into weighted nodes (same results, smaller I).",
+                      action="store_true",
+                      default=False)
+    parser.add_option("--snap",
+                      dest="snap",
+                      help="INT value - Snap demand points to a grid of this size before merging them (implies --aggregate, approximate).",
+                      type=int)
+    parser.add_option("--reduce",
+                      dest="reduce",
+                      help="Remove empty, duplicated and dominated candidate sites before solving (same best coverage, smaller J).",
+                      action="store_true",
+                      default=False)
+    parser.add_option("-g", "--greedy",
+                      dest="greedy",
+                      help="Also solve each instance with the Greedy Adding algorithm (lazy greedy), printed after the CH and LS results.",
+                      action="store_true",
+                      default=False)
+    parser.add_option("--plot-dir",
+                      dest="plot_dir",
+                      help="STRING value - Directory of the input and result plots (PNG). Default: <instances>_plots.",
+                      type=str)
+    parser.add_option("--no-plot",
+                      dest="no_plot",
+                      help="Don't plot (headless runs, matplotlib is not imported).",
+                      action="store_true",
+                      default=False)
+    parser.add_option("--profile",
+                      dest="profile",
+                      help="Write the cProfile output (.pstats and sorted .txt) of each instance to <instances>_profile.",
+                      action="store_true",
+                      default=False)
+    parser.add_option("--memory",
+                      dest="memory",
+                      help="Measure the peak memory of each instance with tracemalloc (slower), added to the results.",
+                      action="store_true",
+                      default=False)
+    parser.add_option("--prefetch",
+                      dest="prefetch",
+                      help="INT value - Instances read ahead by a background thread while the current one is solved (one job only, disabled with --profile and --memory), 0 to disable. Default: 2.",
+                      type=int,
+                      default=2)
+    parser.add_option("-l", "--local-search",
+                      dest="local_search",
+                      help="STRING value - Swap strategy of the local search: 'first' or 'best' improvement, or 'matrix' (best improvement over the whole swap neighborhood scored with sparse matrix products). Default: best.",
+                      type="choice",
+                      choices=["first", "best", "matrix"],
+                      default="best")
     (options, args) = parser.parse_args()
 
     return options, args
 
 
-def mclp(number_of_sites, radius, instance_file):
+def solve_instances(solver, solver_arguments, instances, jobs=1, prefetch=2, needs_read=None):
+    """
+    Solve instance files one by one, or in a process pool
+    INPUT:
+      solver => Function solving one instance file (mclp, mclp_radius_sweep, mclp_sites_range)
+      solver_arguments => Function returning the solver arguments of an instance file
+      instances => List of (instance, instance_file), in the order of the results
+      jobs => Number of worker processes
+      prefetch => Instances read ahead by a background thread when solving one by one, 0 to read each one when solved
+      needs_read => Optional function, False for the instance files the solver won't read (not prefetched)
+    YIELD:
+      (instance, instance_file, solver output), in the order of instances
+
+    With more than one job a failing instance is reported and skipped, so the rest of
+    the batch is still solved.
+    """
+    if jobs <= 1:
+        if prefetch <= 0:
+            for instance, instance_file in instances:
+                yield instance, instance_file, profile_call(solver, solver_arguments(instance_file), instance_file)
+            return
+
+        # Solve the current instance while the next ones are read
+        for instance, instance_file, prefetched in prefetch_instances(instances, prefetch, needs_read):
+            yield instance, instance_file, profile_call(partial(solver, prefetched=prefetched), solver_arguments(instance_file), instance_file)
+        return
+
+    worker_configuration = (cache_configuration(), coverage_configuration(), plot_configuration(), profile_configuration())
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=configure_worker, initargs=worker_configuration) as executor:
+        futures = [(instance, instance_file, executor.submit(solve_instance, solver, solver_arguments(instance_file), instance_file))
+                   for instance, instance_file in instances]
+
+        for instance, instance_file, future in futures:
+            try:
+                solver_output = future.result()
+            except Exception as e:
+                print(f"[-] Error: instance {instance_file} failed => {type(e).__name__}: {e}")
+                continue
+
+            yield instance, instance_file, solver_output
+
+
+def prefetch_instances(instances, prefetch=2, needs_read=None):
+    """
+    Read instance files in a background thread, up to 'prefetch' instances ahead of the consumer
+    INPUT:
+      instances => List of (instance, instance_file)
+      prefetch => Size of the queue of read instances
+      needs_read => Optional function, False for the instance files that are not read (e.g. every result cached)
+    YIELD:
+      (instance, instance_file, (data, read_time)), data as returned by read_data and its read time,
+      or (instance, instance_file, None) for the files that are not read (the solver reads them if needed)
+
+    A read error is raised when its instance is reached, as if it was read in place.
+    """
+    prefetch_queue = queue.Queue(maxsize=prefetch)
+
+    def read_instances():
+        for instance, instance_file in instances:
+            if needs_read is not None and not needs_read(instance_file):
+                prefetch_queue.put((instance, instance_file, None))
+                continue
+
+            try:
+                read_time_start = time.perf_counter()
+                data = read_data(instance_file)
+                prefetched = (data, time.perf_counter() - read_time_start)
+            except Exception as e:
+                prefetched = e
+
+            prefetch_queue.put((instance, instance_file, prefetched))
+
+        # End of the instances
+        prefetch_queue.put(None)
+
+    # Daemon thread: never blocks the exit of the program if the batch stops early
+    threading.Thread(target=read_instances, daemon=True).start()
+
+    while True:
+        prefetched_instance = prefetch_queue.get()
+        if prefetched_instance is None:
+            return
+
+        instance, instance_file, prefetched = prefetched_instance
+        if isinstance(prefetched, Exception):
+            raise prefetched
+
+        yield instance, instance_file, prefetched
+
+
+def configure_worker(worker_cache_configuration, tile_size, plot_directory, worker_profile_configuration):
+    # Same disk cache, coverage builder, plots and instrumentation as the main process
+    configure_cache(*worker_cache_configuration)
+    configure_coverage(tile_size)
+    configure_plots(plot_directory)
+    configure_profile(*worker_profile_configuration)
+
+
+def solve_instance(solver, arguments, instance_file):
+    # Worker processes exit without joining threads: wait for the plots of the instance
+    try:
+        return profile_call(solver, arguments, instance_file)
+    finally:
+        wait_plots()
+
+
+def mclp(number_of_sites, radius, instance_file, local_search_mode='best', aggregate=False, snap=None, reduce_sites=False, greedy=False, prefetched=None):
     print(f"\n[*] Computing instance {instance_file}...")
+    demand = demand_key(aggregate, snap)
+    reduction = reduction_key(reduce_sites)
+    start_phases()
+
+    # Memoized result of an identical run (--cache-dir)
+    cached_result = load_cached_result(instance_file, number_of_sites, radius, local_search_mode, demand + reduction)
+    if cached_result is not None:
+        return cached_result
+
+    # Read input data (unless prefetched)
+    data = instance_data(instance_file, prefetched)
+    population_coordinates = data[0]
+    candidate_sites_coordinates = data[1]
+
+    # Plot input
+    with phase('plot'):
+        plot_input(population_coordinates, candidate_sites_coordinates, instance_file)
+
+    # Demand aggregation (--aggregate, --snap)
+    nodes_coordinates, weights = demand_nodes(population_coordinates, aggregate, snap)
+
+    # Coverage index from cache (--cache-dir), otherwise computed by the CH
+    coverage = None
+    if cache_enabled():
+        coverage = cached_coverage(instance_file, nodes_coordinates, candidate_sites_coordinates, radius, demand)
+
+    result = solve_mclp(nodes_coordinates, candidate_sites_coordinates, number_of_sites, radius, instance_file, local_search_mode, coverage, weights, reduce_sites, greedy)
+    save_cached_result(instance_file, number_of_sites, radius, local_search_mode, result, demand + reduction)
 
-    # Read input data
-    data = read_data(instance_file)
+    return [*result, phase_times()]
+
+
+def mclp_radius_sweep(number_of_sites, radii, instance_file, local_search_mode='best', aggregate=False, snap=None, reduce_sites=False, greedy=False, prefetched=None):
+    print(f"\n[*] Computing instance {instance_file} for radii {radii}...")
+    demand = demand_key(aggregate, snap)
+    reduction = reduction_key(reduce_sites)
+    start_phases()
+
+    # Memoized results of identical runs (--cache-dir)
+    radii_results = {}
+    for radius in radii:
+        cached_result = load_cached_result(instance_file, number_of_sites, radius, local_search_mode, demand + reduction)
+        if cached_result is not None:
+            radii_results[radius] = cached_result
+
+    pending_radii = sorted(radius for radius in radii if radius not in radii_results)
+    if len(pending_radii) == 0:
+        return radii_results
+
+    # Read input data (once for every radius, unless prefetched)
+    data = instance_data(instance_file, prefetched)
     population_coordinates = data[0]
     candidate_sites_coordinates = data[1]
 
     # Plot input
-    plot_input(population_coordinates, candidate_sites_coordinates, instance_file)
+    with phase('plot'):
+        plot_input(population_coordinates, candidate_sites_coordinates, instance_file)
+
+    # Demand aggregation (--aggregate, --snap)
+    nodes_coordinates, weights = demand_nodes(population_coordinates, aggregate, snap)
+
+    # Solve MCLP for each radius: coverage from the cache (--cache-dir), otherwise thresholding
+    # the sorted neighbors, computed once (read and distance phases are counted in the first radius)
+    neighbors = None
+    for radius_index, radius in enumerate(pending_radii):
+        with phase('coverage'):
+            coverage = load_cached_coverage(instance_file, radius, demand)
+
+        if coverage is None:
+            if neighbors is None or radius > neighbors['max_radius']:
+                # Neighbors up to the largest radius still missing from the cache
+                uncached_radii = [radius] + [next_radius for next_radius in pending_radii[radius_index+1:]
+                                             if not coverage_cached(instance_file, next_radius, demand)]
+                with phase('distance'):
+                    neighbors = build_sorted_neighbors(nodes_coordinates, candidate_sites_coordinates, max(uncached_radii))
+
+            with phase('coverage'):
+                coverage = coverage_at_radius(neighbors, radius)
+            save_cached_coverage(instance_file, radius, coverage, demand)
+
+        result = solve_mclp(nodes_coordinates, candidate_sites_coordinates, number_of_sites, radius, instance_file, local_search_mode, coverage, weights, reduce_sites, greedy)
+        save_cached_result(instance_file, number_of_sites, radius, local_search_mode, result, demand + reduction)
+
+        radii_results[radius] = [*result, phase_times()]
+        start_phases()
+
+    return radii_results
+
+
+def mclp_sites_range(max_sites, radius, instance_file, checkpoints=[], local_search_mode='best', aggregate=False, snap=None, reduce_sites=False, prefetched=None):
+    print(f"\n[*] Computing instance {instance_file} for every p <= {max_sites}...")
+
+    # Read input data (unless prefetched)
+    data = instance_data(instance_file, prefetched)
+    population_coordinates = data[0]
+    candidate_sites_coordinates = data[1]
+
+    # Demand aggregation (--aggregate, --snap)
+    nodes_coordinates, weights = demand_nodes(population_coordinates, aggregate, snap)
+
+    # Compute coverage index (or read it from cache, --cache-dir)
+    coverage = cached_coverage(instance_file, nodes_coordinates, candidate_sites_coordinates, radius, demand_key(aggregate, snap))
+
+    # Dominance reduction (--reduce)
+    site_map = None
+    if reduce_sites:
+        with phase('coverage'):
+            coverage, site_map = reduce_candidate_sites(coverage)
+
+    J_size = coverage.shape[0]
+
+    # Greedy Adding is nested: the solution for p sites is a prefix of the solution for p+1
+    ga_time_start = time.perf_counter()
+    selected_sites, selected_sites_gains = lazy_greedy(coverage, max_sites, weights)
+    ga_time_elapsed = time.perf_counter() - ga_time_start
+    print(f"[+] Greedy Adding algorithm execution time: {ga_time_elapsed}s")
+
+    # [p, GA objective function, GA sites, LS objective function, LS sites] for every p
+    sites_range_rows = []
+    ga_objF_value = 0
+
+    for p in range(1, max_sites+1):
+        # Greedy stops early once every coverable node is covered
+        if p <= len(selected_sites):
+            ga_objF_value += selected_sites_gains[p-1]
+
+        ga_objF_sites = selected_sites[:p]
+        ls_objF_value = None
+        ls_objF_sites = None
+
+        # Local search at checkpoints
+        if p in checkpoints:
+            ga_objF_sites_set = set(ga_objF_sites)
+            free_sites = [site for site in range(J_size) if site not in ga_objF_sites_set]
+            ls_objF_sites, ls_objF_value, moves = swap_local_search(coverage, ga_objF_sites, free_sites, local_search_mode, weights)
+            ls_objF_sites = excel_sites(ls_objF_sites, site_map)
+            print(f"[+] p = {p} => GA: {ga_objF_value}, LS: {ls_objF_value} ({moves} swaps)")
+
+        sites_range_rows.append([p, ga_objF_value, excel_sites(ga_objF_sites, site_map), ls_objF_value, ls_objF_sites])
+
+    print(f"[+] Objective Function (p = {max_sites}) => {ga_objF_value}")
+
+    return sites_range_rows
+
+
+def demand_nodes(population_coordinates, aggregate=False, snap=None):
+    """
+    Demand nodes of an instance, optionally aggregated into weighted nodes
+    INPUT:
+      population_coordinates => Population coordinates of the instance
+      aggregate => Merge identical demand points into one node weighted by its number of points
+      snap => Optional grid size, points are snapped to the grid before merging (implies aggregate)
+    RETURN:
+      nodes_coordinates => Coordinates of the demand nodes
+      weights => Demand of each node, None if not aggregated (1 per node)
+    """
+    if not aggregate and snap is None:
+        return population_coordinates, None
+
+    nodes_coordinates, weights = aggregate_demand(population_coordinates, snap)
+    print(f"[*] Demand aggregation: {len(population_coordinates)} points => {len(nodes_coordinates)} nodes")
+
+    return nodes_coordinates, weights
+
+
+def demand_key(aggregate=False, snap=None):
+    # Cache key suffix of the demand nodes
+    if snap is not None:
+        return f'_snap{snap}'
+    if aggregate:
+        return '_aggregated'
+    return ''
+
+
+def reduction_key(reduce_sites=False):
+    # Cache key suffix of the candidate sites
+    if reduce_sites:
+        return '_reduced'
+    return ''
+
+
+def reduce_candidate_sites(coverage):
+    """
+    Remove empty, duplicated and dominated candidate sites (see reduce_dominated_sites)
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+    RETURN:
+      reduced_coverage => CSR coverage matrix of the kept sites
+      site_map => Original index of each kept site
+    """
+    J_size = coverage.shape[0]
+    reduced_coverage, site_map = reduce_dominated_sites(coverage)
+    print(f"[*] Dominance reduction: removed {J_size - len(site_map)} of {J_size} candidate sites")
+
+    return reduced_coverage, site_map
+
+
+def excel_sites(sites, site_map=None):
+    """
+    Excel indexes (starting from 1) of a list of sites
+    INPUT:
+      sites => Site indexes
+      site_map => Original index of each site after a dominance reduction, None if not reduced
+    RETURN:
+      List of Excel indexes of the sites in the instance file
+    """
+    if site_map is None:
+        return [int(site)+1 for site in sites]
+
+    return [int(site_map[site])+1 for site in sites]
+
+
+def cached_coverage(instance_file, population_coordinates, candidate_sites_coordinates, radius, demand=''):
+    """
+    Coverage index of an instance, reused across runs and solver methods through the disk cache
+    INPUT:
+      instance_file => Instance file name (its content hash is the cache key)
+      population_coordinates, candidate_sites_coordinates => Instance data
+      radius => Service radius of each site
+      demand => Cache key suffix of the demand nodes (see demand_key)
+    RETURN:
+      coverage CSR matrix (J x I)
+    """
+    if not cache_enabled():
+        return build_coverage(population_coordinates, candidate_sites_coordinates, radius)
+
+    coverage = load_cached_coverage(instance_file, radius, demand)
+
+    if coverage is None:
+        coverage = build_coverage(population_coordinates, candidate_sites_coordinates, radius)
+        save_cached_coverage(instance_file, radius, coverage, demand)
+
+    return coverage
+
+
+def coverage_key(instance_file, radius, demand=''):
+    return f'{file_hash(instance_file)}_r{radius}_euclidean{demand}'
+
+
+def load_cached_coverage(instance_file, radius, demand=''):
+    """
+    Coverage index of an (instance, radius) from the disk cache
+    RETURN:
+      coverage CSR matrix (J x I), None if the cache is disabled or the coverage is not cached
+    """
+    if not cache_enabled():
+        return None
+
+    cached_entry = load_arrays('coverage', coverage_key(instance_file, radius, demand))
+    if cached_entry is None:
+        return None
+
+    print(f"[*] Coverage index (radius {radius}) read from cache.")
+    return coverage_from_arrays(cached_entry['indptr'], cached_entry['indices'], cached_entry['shape'])
+
+
+def save_cached_coverage(instance_file, radius, coverage, demand=''):
+    if not cache_enabled():
+        return
+
+    save_arrays('coverage', coverage_key(instance_file, radius, demand),
+                indptr=coverage.indptr, indices=coverage.indices, shape=np.array(coverage.shape))
+
+
+def coverage_cached(instance_file, radius, demand=''):
+    # Whether the coverage of an (instance, radius) is in the disk cache, without reading it
+    return cache_enabled() and has_entry('coverage', coverage_key(instance_file, radius, demand))
+
+
+def result_key(instance_file, number_of_sites, radius, local_search_mode, demand=''):
+    return f'{file_hash(instance_file)}_p{number_of_sites}_r{radius}_{local_search_mode}{demand}'
+
+
+def load_cached_result(instance_file, number_of_sites, radius, local_search_mode, demand=''):
+    """
+    Memoized [ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed, phases] of an identical run
+    RETURN:
+      Result list (phases are not measured, empty), None if the cache is disabled or the run is not cached
+    """
+    if not cache_enabled():
+        return None
+
+    cached_entry = load_arrays('results', result_key(instance_file, number_of_sites, radius, local_search_mode, demand))
+    if cached_entry is None:
+        return None
+
+    print(f"[*] Result (p = {number_of_sites}, radius = {radius}, {local_search_mode}) read from cache.")
+    ch_objF_value, ls_objF_value = cached_entry['objF_values'].tolist()
+    ch_time_elapsed, ls_time_elapsed = cached_entry['times'].tolist()
+
+    return [ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed, {}]
 
+
+def results_cached(instance_file, number_of_sites, radii, local_search_mode, demand=''):
+    # Whether the results of every radius are memoized, so the solver returns without reading the instance
+    return cache_enabled() and all(has_entry('results', result_key(instance_file, number_of_sites, radius, local_search_mode, demand))
+                                   for radius in radii)
+
+
+def save_cached_result(instance_file, number_of_sites, radius, local_search_mode, result, demand=''):
+    if not cache_enabled():
+        return
+
+    ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed = result[:4]
+    save_arrays('results', result_key(instance_file, number_of_sites, radius, local_search_mode, demand),
+                objF_values=np.array([ch_objF_value, ls_objF_value], dtype=np.int64),
+                times=np.array([ch_time_elapsed, ls_time_elapsed], dtype=float))
+
+
+def solve_mclp(population_coordinates, candidate_sites_coordinates, number_of_sites, radius, instance_file, local_search_mode='best', coverage=None, weights=None, reduce_sites=False, greedy=False):
     # Start CH timer
-    ch_time_start = time.clock()
+    ch_time_start = time.perf_counter()
+
+    # Dominance reduction (--reduce): solve over the kept sites, site_map[k] is the original index of site 'k'
+    site_map = None
+    solver_sites_coordinates = candidate_sites_coordinates
+    if reduce_sites:
+        if coverage is None:
+            coverage = build_coverage(population_coordinates, candidate_sites_coordinates, radius)
+        with phase('coverage'):
+            coverage, site_map = reduce_candidate_sites(coverage)
+        solver_sites_coordinates = np.asarray(candidate_sites_coordinates).reshape(-1, 2)[site_map]
 
     # Solve MCLP by CH (Constructive Heuristic)
-    ch_data = mclp_ch(population_coordinates, candidate_sites_coordinates, number_of_sites, radius, instance_file)
+    with phase('construct'):
+        ch_data = mclp_ch(population_coordinates, solver_sites_coordinates, number_of_sites, radius, instance_file, coverage, weights, site_map)
 
     # End CH timer
-    ch_time_elapsed = time.clock() - ch_time_start
+    ch_time_elapsed = time.perf_counter() - ch_time_start
     print(f"[+] Constructive Heuristic execution time: {ch_time_elapsed}s")
 
 
     # Start LS timer
-    ls_time_start = time.clock()
+    ls_time_start = time.perf_counter()
 
     # Solve MCLP by LS (Local Search)
 
@@ -302,13 +938,14 @@ def mclp(number_of_sites, radius, instance_file):
     ch_objF_value = ch_data[0]
     ch_objF_sites = ch_data[1]
     ch_free_sites = ch_data[2]
-    ch_sites_with_objF = ch_data[3]
+    ch_coverage = ch_data[4]
 
     # Get output from LS
-    ls_objF_sites, ls_objF_value = mclp_ls(ch_objF_value, ch_objF_sites, ch_free_sites, ch_sites_with_objF)
+    with phase('local_search'):
+        ls_objF_sites, ls_objF_value = mclp_ls(ch_objF_value, ch_objF_sites, ch_free_sites, ch_coverage, local_search_mode, weights, site_map)
     
     # End LS timer
-    ls_time_elapsed = time.clock() - ls_time_start
+    ls_time_elapsed = time.perf_counter() - ls_time_start
     print(f"[+] Local Search Heuristic execution time: {ls_time_elapsed}s")
 
     # Final MCLP output
@@ -322,96 +959,101 @@ def mclp(number_of_sites, radius, instance_file):
     print(f"[+] Execution time => {ls_time_elapsed}")
     print("--------------------------------------------------------------\n\n")
 
-    # Plot Output
-    plot_output(population_coordinates, candidate_sites_coordinates, ch_objF_sites, ch_objF_value, ls_objF_sites, ls_objF_value, radius, instance_file)
+    # Plot Output (original site indexes)
+    if site_map is not None:
+        ch_objF_sites = site_map[ch_objF_sites].tolist()
+        ls_objF_sites = site_map[ls_objF_sites].tolist()
 
-    # Start GA timer
-    #ga_time_start = time.clock()
+    with phase('plot'):
+        plot_output(population_coordinates, candidate_sites_coordinates, ch_objF_sites, ch_objF_value, ls_objF_sites, ls_objF_value, radius, instance_file)
 
-    # Solve MCLP by GA (Greedy Adding)
-    #ga_data = mclp_ga(population_coordinates, candidate_sites_coordinates, number_of_sites, radius, instance_file)
-    
-    # End GA timer
-    #ga_time_elapsed = time.clock() - ga_time_start
-    #print(f"[+] Greedy Adding algorithm execution time: {ga_time_elapsed}s")
+    # Solve MCLP by GA (Greedy Adding, --greedy)
+    if greedy:
+        # Start GA timer
+        ga_time_start = time.perf_counter()
 
-    return ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed
+        with phase('greedy'):
+            ga_data = mclp_ga(population_coordinates, solver_sites_coordinates, number_of_sites, radius, instance_file, ch_coverage, weights, site_map)
 
+        # End GA timer
+        ga_time_elapsed = time.perf_counter() - ga_time_start
+        print(f"[+] Greedy Adding algorithm execution time: {ga_time_elapsed}s")
 
-def sorted_ls(path):
-    mtime = lambda f: os.stat(os.path.join(path, f)).st_mtime
-    return list(sorted(os.listdir(path), key=mtime))
+        print(f"\n--------------- GREEDY ADDING RESULTS ---------------")
+        print(f"[*] File => {instance_file}")
+        print(f"[+] Objective Function => {ga_data[0]}")
+        print(f"[+] Execution time => {ga_time_elapsed}s")
+        print("--------------------------------------------------------------\n\n")
 
+    return ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed
 
-def read_data(file):
-    # Read population nodes
-    population_df = pd.read_excel(f'{file}', sheet_name="Population")
-    population_x = population_df['x'].tolist()
-    population_y = population_df['y'].tolist()
 
-    population_coordinates = list(zip(population_x, population_y))
+def instance_data(instance_file, prefetched=None):
+    """
+    Input data of an instance, timed as its read phase
+    INPUT:
+      instance_file => Instance file name
+      prefetched => (data, read_time) read by the prefetch thread (see prefetch_instances), None to read it now
+    RETURN:
+      data => (population_coordinates, candidate_sites_coordinates), see read_data
+    """
+    if prefetched is None:
+        with phase('read'):
+            return read_data(instance_file)
 
-    # Read candidate sites nodes
-    candidate_sites_df = pd.read_excel(f'{file}', sheet_name="Candidate sites")
-    candidate_sites_x = candidate_sites_df['x'].tolist()
-    candidate_sites_y = candidate_sites_df['y'].tolist()
-    
-    candidate_sites_coordinates = list(zip(candidate_sites_x, candidate_sites_y))
+    data, read_time = prefetched
+    add_phase_time('read', read_time)
 
-    return population_coordinates, candidate_sites_coordinates
+    return data
 
 
-def plot_input(population_coordinates, candidate_sites_coordinates, instance_file):
-    population_coordinates = array(population_coordinates)
-    candidate_sites_coordinates = array(candidate_sites_coordinates)
+def sorted_ls(path):
+    # Instance files only (results, plots and profiles of single file runs may be written next to them)
+    instance_file = lambda f: (f.endswith(INSTANCE_EXTENSIONS) and not f.endswith('_results.xlsx')
+                               and os.path.isfile(os.path.join(path, f)))
+    mtime = lambda f: os.stat(os.path.join(path, f)).st_mtime
+    return list(sorted(filter(instance_file, os.listdir(path)), key=mtime))
 
-    from matplotlib import pyplot as plt
-    fig = plt.figure(figsize=(8,8))
 
-    fig.suptitle('INPUT', fontsize=14, fontweight='bold')
+def read_data(file):
+    # Binary instance: population and candidate sites are memory-mapped, zero-copy
+    if is_binary_instance(file):
+        return read_instance_binary(file)
 
-    plt.scatter(population_coordinates[:,0], population_coordinates[:,1], c='C0', s=1)
-    plt.scatter(candidate_sites_coordinates[:,0], candidate_sites_coordinates[:, 1], c='red')
-    ax = plt.gca()
+    # Parsed instance cache (--cache-dir), keyed by the file content
+    if cache_enabled():
+        instance_key = file_hash(file)
+        cached_instance = load_arrays('instances', instance_key)
 
-    ax.set_title(f'{instance_file}\nPopulation/Demand color: Blue\nCandidate sites color: Red', fontsize=9)
+        if cached_instance is not None:
+            print(f"[*] Instance {file} read from cache.")
+            return cached_instance['population'], cached_instance['candidate_sites']
 
-    ax.axis('equal')
-    ax.tick_params(axis='both', left=True, top=False, right=False,
-                    bottom=True, labelleft=True, labeltop=False,
-                    labelright=False, labelbottom=True)
+    # Read population and candidate sites nodes (single workbook open)
+    population_coordinates, candidate_sites_coordinates = read_instance_xlsx(file)
 
-    ax.set_xlabel(f'Population/Demand points: {len(population_coordinates)}\nCandidate sites: {len(candidate_sites_coordinates)}')
-    #plt.show()
+    if cache_enabled():
+        save_arrays('instances', instance_key, population=population_coordinates, candidate_sites=candidate_sites_coordinates)
 
+    return population_coordinates, candidate_sites_coordinates
 
-def mclp_ga(population_points, candidate_sites_points, number_sites_to_select, radius, instance_name):
+
+def mclp_ga(population_points, candidate_sites_points, number_sites_to_select, radius, instance_name, coverage=None, weights=None, site_map=None):
     print("\n[***] GREEDY ADDING ALGORITHM [***]")
     """
         INPUT
     """
     print("\n[+++] INPUT [+++]")
 
-    # Assocciate index to each population coordinate
     print(f"[*] POPULATION POINTS => {len(population_points)}")
     print(f"[*] CANDIDATE SITES => {len(candidate_sites_points)}")
     print(f"[*] NUMBER OF SITES TO SELECT => {number_sites_to_select}")
     print(f"[*] RADIUS => {radius}")
     print(f"[*] INSTANCE NAME => {instance_name}")
 
-    # Associate index to population points, starting from 1
-    population_points_with_index = []
-    for point in population_points:
-        population_points_with_index.append((population_points.index(point)+1, point))
-    
-    # Associate index to candidate sites, starting from 1
-    candidate_sites_points_with_index = []
-    for point in candidate_sites_points:
-        candidate_sites_points_with_index.append((candidate_sites_points.index(point),point))
-
-    # Cast to numpy arrays
-    population_points = array(population_points)
-    candidate_sites_points = array(candidate_sites_points)
+    # Cast to numpy arrays (row 'i' is node 'i', row 'j' is site 'j')
+    population_points = np.asarray(population_points).reshape(-1, 2)
+    candidate_sites_points = np.asarray(candidate_sites_points).reshape(-1, 2)
     
     # Size of I and J
     I_size = population_points.shape[0]
@@ -420,82 +1062,35 @@ def mclp_ga(population_points, candidate_sites_points, number_sites_to_select, r
     """
         ALGORITHM
     """
-    # 1. Start with an empty solution
-    selected_sites = []
-
-    # 2. Compute distance matrix
-    from scipy.spatial.distance import cdist
-    dist_matrix = cdist(population_points, candidate_sites_points, 'euclidean').astype(int)
-    
-    # 3. Compute boolean matrix
-    boolean_matrix = dist_matrix.copy()
-    constraint1 = dist_matrix <= radius # Validates if demand point 'i' is under radius of site 'j'
-    boolean_matrix[constraint1] = 1 # Stores boolean 'True' if demand point 'i' is under radius of site 'j'
-    boolean_matrix[~constraint1] = 0 # Stores boolean 'False' if demand point 'i' is NOT under radius of site 'j'
-    
-    # 4. Compute INDIVIDUAL covered nodes by each site in boolean matrix
-    current_covered_nodes = []
-    sites_with_covered_nodes = {}
-
-    # for site in boolean_matrix...
-    for i, site in candidate_sites_points_with_index:
-        site_all_covered_nodes = np.where(boolean_matrix[:,i] == True)[0]
-        site_individual_covered_nodes = []
-
-        # for node in site:
-        for node in site_all_covered_nodes:
-            if node not in current_covered_nodes:
-                site_individual_covered_nodes.append(node)
-                current_covered_nodes.append(node)
-            else:
-                pass
+    # 1-3. Compute coverage index (Site 'j' => ['i' nodes covered by site 'j']), unless given
+    if coverage is None:
+        coverage = build_coverage(population_points, candidate_sites_points, radius)
 
-        sites_with_covered_nodes[i] = site_individual_covered_nodes
-    
-    for site in sites_with_covered_nodes:
-        nodes_covered_by_site = len(sites_with_covered_nodes[site])
+    # 4. Compute ALL covered nodes by each site in coverage index
+    sites_with_objective_function = {}
+    for site in range(J_size):
+        nodes_covered_by_site = len(site_covered_nodes(coverage, site))
+        sites_with_objective_function[site] = node_demand(site_covered_nodes(coverage, site), weights)
 
         if nodes_covered_by_site > 0:
-            print(f"SITE {site+1} => {nodes_covered_by_site} nodes covered")
-    
-    # 5. Pick the site that covers most of the total population
-    # Create dictionary with the sum of covered nodes
-    sites_with_objective_function = {}
-    for site in sites_with_covered_nodes:
-        sites_with_objective_function[site] = len(sites_with_covered_nodes[site])
-    sites_with_objective_function_copy = sites_with_objective_function.copy()
+            print(f"SITE {excel_sites([site], site_map)[0]} => {nodes_covered_by_site} nodes covered")
+
+    print(f"[*] COVERED NODES BY ALL CANDIDATE SITES => {len(np.unique(coverage.indices))}")
 
     """
-    7. Repeat step 5, stop until
+    5-7. Pick the site with the largest marginal gain until
     (len(solution) == number_sites_to_select)
                    or
     (len(current_covered_nodes) == len(population_points))
     """
-    print(f"[*] COVERED NODES BY ALL CANDIDATE SITES => {len(current_covered_nodes)}")
-
-    loop_boolean_value = True
-    while loop_boolean_value == True:
-        # 5. Pick the site that covers most of the total population
-        # Site whose objective function is the largest
-        site_with_max_population = max(sites_with_objective_function, key = lambda k: sites_with_objective_function[k])
-
-        # 6. Add_site_with_max_population to solution, and remove it from sites_with_objective_function
-        selected_sites.append(site_with_max_population)
-        sites_with_objective_function.pop(site_with_max_population)
-
-        # Constraint
-        if (len(selected_sites) == number_sites_to_select) or (len(current_covered_nodes) == len(population_points)):
-            loop_boolean_value = False
+    selected_sites, selected_sites_gains = lazy_greedy(coverage, number_sites_to_select, weights)
 
     # Compute objective function (covered population)
-    objective_function = 0
-    for site in selected_sites:
-        objective_function += sites_with_objective_function_copy[site]
+    objective_function = objective_value(coverage, selected_sites, weights)
 
-    # Filter free sites (With Excel index)
-    free_sites = []
-    for site in sites_with_objective_function:
-        free_sites.append(site+1)
+    # Filter free sites
+    selected_sites_set = set(selected_sites)
+    free_sites = [site for site in range(J_size) if site not in selected_sites_set]
 
     """
         OUTPUT
@@ -503,91 +1098,131 @@ def mclp_ga(population_points, candidate_sites_points, number_sites_to_select, r
     print("\n[+++] OUTPUT [+++]")
 
     # Solution - Selected sites (Display Excel instances nodes)
-    selected_sites_excel_instance = [site+1 for site in selected_sites]
+    selected_sites_excel_instance = excel_sites(selected_sites, site_map)
     print(f"[+] SOLUTION - SELECTED SITES => {selected_sites_excel_instance}")
 
-    # Free sites
-    print(f"[+] FREE SITES => {free_sites}")
+    # Solution - Marginal gain of each selected site
+    print(f"[+] SOLUTION - MARGINAL GAINS => {selected_sites_gains}")
+
+    # Free sites (With Excel index)
+    print(f"[+] FREE SITES => {excel_sites(free_sites, site_map)}")
 
     # Solution - Covered population
     print(f"[+] SOLUTION - OBJECTIVE FUNCTION (COVERED POPULATION) => {objective_function}")
 
-    return
+    return objective_function, selected_sites, free_sites, sites_with_objective_function, coverage
 
 
-def mclp_ch(population_points, candidate_sites_points, number_sites_to_select, radius, instance_name):
+def lazy_greedy(coverage, number_sites_to_select, weights=None):
+    """
+    Greedy Adding with lazy (CELF) evaluation of marginal gains
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+      number_sites_to_select => Maximum number of sites to select
+      weights => Optional demand of each node, 1 per node if None
+    RETURN:
+      selected_sites => Site indexes, in the order they were added
+      selected_sites_gains => Marginal gain (new covered demand) of each selected site
+
+    Marginal gains can only decrease as the solution grows, so a stale gain is an
+    upper bound. Each site is kept in a max-heap with the gain computed at some
+    earlier round, and is only re-evaluated when it reaches the top of the heap.
+    If its fresh gain still tops the heap, it is the best site of the round.
+    """
+    J_size, I_size = coverage.shape
+
+    # Demand covered state (bitset, see coverage_index.py)
+    covered_bits = np.zeros((I_size + 63) // 64, dtype=np.uint64)
+
+    # Max-heap of (-gain, site), all gains computed at round 0
+    heap = [(-node_demand(site_covered_nodes(coverage, site), weights), site) for site in range(J_size)]
+    heapq.heapify(heap)
+    evaluated_round = np.zeros(J_size, dtype=np.int64)
+
+    selected_sites = []
+    selected_sites_gains = []
+
+    while heap and len(selected_sites) < number_sites_to_select:
+        negative_gain, site = heapq.heappop(heap)
+        current_round = len(selected_sites)
+
+        if evaluated_round[site] == current_round:
+            # Up to date gain on top of the heap: best site of the round
+            if negative_gain == 0:
+                # Every coverable node is already covered
+                break
+
+            selected_sites.append(site)
+            selected_sites_gains.append(-negative_gain)
+            mark_nodes(covered_bits, site_covered_nodes(coverage, site))
+
+        else:
+            # Stale gain: re-evaluate against the current covered nodes
+            gain = marginal_gain(covered_bits, site_covered_nodes(coverage, site), weights)
+            evaluated_round[site] = current_round
+            heapq.heappush(heap, (-gain, site))
+
+    return selected_sites, selected_sites_gains
+
+
+def node_demand(nodes, weights=None):
+    """
+    Demand of a set of nodes
+    INPUT:
+      nodes => Array of node indexes
+      weights => Optional demand of each node (see aggregate_demand), 1 per node if None
+    RETURN:
+      Number of nodes, or the sum of their weights
+    """
+    if weights is None:
+        return len(nodes)
+
+    return int(weights[nodes].sum())
+
+
+def mclp_ch(population_points, candidate_sites_points, number_sites_to_select, radius, instance_name, coverage=None, weights=None, site_map=None):
     print("\n[***] CONSTRUCTIVE HEURISTIC ALGORITHM [***]")
     """
         INPUT
     """
     print("\n[+++] INPUT [+++]")
 
-    # Assocciate index to each population coordinate
     print(f"[*] POPULATION POINTS => {len(population_points)}")
     print(f"[*] CANDIDATE SITES => {len(candidate_sites_points)}")
     print(f"[*] NUMBER OF SITES TO SELECT => {number_sites_to_select}")
     print(f"[*] RADIUS => {radius}")
     print(f"[*] INSTANCE NAME => {instance_name}")
 
-    # Associate index to population points, starting from 1
-    population_points_with_index = []
-    for point in population_points:
-        population_points_with_index.append((population_points.index(point)+1, point))
-    
-    # Associate index to candidate sites, starting from 1
-    candidate_sites_points_with_index = []
-    for point in candidate_sites_points:
-        candidate_sites_points_with_index.append((candidate_sites_points.index(point),point))
-
-    # Cast to numpy arrays
-    population_points = array(population_points)
-    candidate_sites_points = array(candidate_sites_points)
+    # Cast to numpy arrays (row 'i' is node 'i', row 'j' is site 'j')
+    population_points = np.asarray(population_points).reshape(-1, 2)
+    candidate_sites_points = np.asarray(candidate_sites_points).reshape(-1, 2)
     
     # Size of I and J
     I_size = population_points.shape[0]
     J_size = candidate_sites_points.shape[0]
 
+    # Total demand
+    population_size = node_demand(np.arange(I_size), weights)
+
     """
         ALGORITHM
     """
-    # Compute distance matrix
-    from scipy.spatial.distance import cdist
-    dist_matrix = cdist(population_points, candidate_sites_points, 'euclidean').astype(int)
+    # Compute coverage index (Site 'j' => ['i' nodes covered by site 'j']), unless given
+    if coverage is None:
+        coverage = build_coverage(population_points, candidate_sites_points, radius)
     
-    # Compute boolean matrix
-    boolean_matrix = dist_matrix.copy()
-    constraint1 = dist_matrix <= radius # Validates if demand point 'i' is under radius of site 'j'
-    boolean_matrix[constraint1] = 1 # Stores boolean 'True' if demand point 'i' is under radius of site 'j'
-    boolean_matrix[~constraint1] = 0 # Stores boolean 'False' if demand point 'i' is NOT under radius of site 'j'
-    
-    # Compute INDIVIDUAL covered nodes by each site in boolean matrix
-    current_covered_nodes = []
-    sites_with_covered_nodes = {}
-
-    # for site in boolean_matrix...
-    for i, site in candidate_sites_points_with_index:
-        site_all_covered_nodes = np.where(boolean_matrix[:,i] == True)[0]
-        site_individual_covered_nodes = []
-
-        # for node in site:
-        for node in site_all_covered_nodes:
-            if node not in current_covered_nodes:
-                site_individual_covered_nodes.append(node)
-                current_covered_nodes.append(node)
-            else:
-                pass
-
-        sites_with_covered_nodes[i] = site_individual_covered_nodes
+    # Compute INDIVIDUAL covered nodes by each site in coverage index
+    # (each node goes to the first site that covers it)
+    sites_with_covered_nodes = first_come_assignment(coverage)
     
     for site in sites_with_covered_nodes:
         nodes_covered_by_site = len(sites_with_covered_nodes[site])
         
         if nodes_covered_by_site > 0:
-            print(f"SITE {site+1} => {nodes_covered_by_site} nodes covered")
+            print(f"SITE {excel_sites([site], site_map)[0]} => {nodes_covered_by_site} nodes covered")
 
     # Start with an empty solution
     selected_sites = []
-    population_size = len(population_points)
     free_sites = sites_with_covered_nodes.copy()
 
     # Iterate until a feasible solution is found
@@ -609,18 +1244,16 @@ def mclp_ch(population_points, candidate_sites_points, number_sites_to_select, r
         else:
             break
 
-    # Create dictionary with the sum of covered nodes
+    # Create dictionary with the sum of covered nodes (demand)
     sites_with_objective_function = {}
     for site in sites_with_covered_nodes:
-        sites_with_objective_function[site] = len(sites_with_covered_nodes[site])
+        sites_with_objective_function[site] = node_demand(sites_with_covered_nodes[site], weights)
 
-    # Compute objective function
-    objective_function = 0
-    for site in selected_sites:
-        objective_function += sites_with_objective_function[site]
+    # Compute objective function (union of the nodes covered by the selected sites)
+    objective_function = objective_value(coverage, selected_sites, weights)
 
     # Create selected sites Excel copy
-    selected_sites_excel_copy = [site+1 for site in selected_sites]
+    selected_sites_excel_copy = excel_sites(selected_sites, site_map)
     
     # Create free sites indexes copy
     free_sites_copy = []
@@ -628,9 +1261,7 @@ def mclp_ch(population_points, candidate_sites_points, number_sites_to_select, r
         free_sites_copy.append(site)
 
     # Create free sites Excel copy
-    free_sites_excel_copy = []
-    for site in free_sites:
-        free_sites_excel_copy.append(site+1)
+    free_sites_excel_copy = excel_sites(free_sites, site_map)
 
     """
         OUTPUT
@@ -640,59 +1271,37 @@ def mclp_ch(population_points, candidate_sites_points, number_sites_to_select, r
     print(f"[+] FREE SITES => {free_sites_excel_copy}")
     print(f"[+] OBJECTIVE FUNCTION (Covered population/points) => {objective_function}")
 
-    return objective_function, selected_sites, free_sites_copy, sites_with_objective_function
+    return objective_function, selected_sites, free_sites_copy, sites_with_objective_function, coverage
 
 
-def mclp_ls(objF_value, objF_sites, free_sites, sites_with_objF):
+def mclp_ls(objF_value, objF_sites, free_sites, coverage, mode='best', weights=None, site_map=None):
     print("\n[*] *** LOCAL SEARCH HEURISTIC ***")
     print(f"[*] Current objective function = {objF_value}")
+    print(f"[*] Swap mode = {mode}-improvement")
     """
         INPUT
     """
     objF_copy = int(objF_value)
-    objF_sites_copy = objF_sites.copy()
-    free_sites_copy = free_sites.copy()
-    sites_with_objF_copy = sites_with_objF.copy()
+    objF_sites_copy = list(objF_sites)
+    free_sites_copy = list(free_sites)
 
     """
         ALGORITHM
     """
-    for i,site in enumerate(objF_sites_copy):
-        site_objF = sites_with_objF_copy[site]
-
-        for fr_i, free_site in enumerate(free_sites_copy):
-            free_site_objF = sites_with_objF_copy[free_site]
-
-            if free_site_objF > site_objF:
-                objF_sites_copy[i] = free_site
-                free_sites_copy.pop(fr_i)
-            
-            else:
-                pass
-
-    new_sites_set = objF_sites_copy.copy()
-    
-    # Compute new objective function value
-    new_objF_value = 0
-    for site in new_sites_set:
-        new_objF_value += sites_with_objF[site]
+    new_sites_set, new_objF_value, moves = swap_local_search(coverage, objF_sites_copy, free_sites_copy, mode, weights)
 
     """
         OUTPUT
     """
     # Prepare objF_sites_copy indexes (Referencing to Excel nodes)
-    old_sites_excel = []
-    for site in objF_sites:
-        old_sites_excel.append(site+1)
+    old_sites_excel = excel_sites(objF_sites, site_map)
 
     # Prepare new_sites_set indexes (Referencing to Excel nodes)
-    new_sites_excel = []
-    for site in new_sites_set:
-        new_sites_excel.append(site+1)
+    new_sites_excel = excel_sites(new_sites_set, site_map)
     
 
     if new_objF_value > objF_copy:
-        print("[+] Solution improved.")
+        print(f"[+] Solution improved after {moves} swaps.")
         print(f"[+] NEW OBJECTIVE FUNCTION => {new_objF_value}")
         print(f"[+] OLD SITES => {old_sites_excel}")
         print(f"[+] NEW SITES => {new_sites_excel}")
@@ -703,38 +1312,264 @@ def mclp_ls(objF_value, objF_sites, free_sites, sites_with_objF):
         return objF_sites, objF_value
 
 
-def plot_output(population_coordinates, candidate_sites_coordinates, ch_objF_sites, ch_objF_value, ls_objF_sites, ls_objF_value, radius, instance_file):
-    population_coordinates = array(population_coordinates)
-    candidate_sites_coordinates = array(candidate_sites_coordinates)
+def swap_local_search(coverage, selected_sites, free_sites, mode='best', weights=None):
+    """
+    1-swap (drop/add) local search with incremental delta evaluation
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+      selected_sites => List of selected site indexes (initial solution)
+      free_sites => List of free site indexes
+      mode => 'best' applies the best swap of the neighborhood, 'first' the first improving one,
+              'matrix' scores the whole neighborhood at once (see matrix_swap_local_search)
+      weights => Optional demand of each node, 1 per node if None
+    RETURN:
+      selected_sites => Local optimum
+      objective_function => Covered nodes (demand) of the local optimum
+      moves => Number of applied swaps
+
+    A per-node count of selecting sites is kept. Dropping site 's' uncovers its nodes
+    whose count falls to 0, and adding site 'f' covers its nodes whose count is 0 once
+    's' is dropped. The free sites are scored together for each dropped site:
+        gain[f] <== demand of the uncovered nodes of 'f' (once per move)
+        delta[f] = gain[f] - loss[s] + demand of the nodes uncovered by dropping 's' that 'f' covers
+    so each dropped site costs one sparse product over the sites covering its lost nodes.
+    """
+    if mode == 'matrix':
+        return matrix_swap_local_search(coverage, selected_sites, free_sites, weights)
 
-    fig = plt.figure(figsize=(8,8))
-    fig.suptitle('RESULTS', fontsize=14, fontweight='bold')
+    if mode not in ('best', 'first'):
+        raise ValueError(f"Unknown local search mode '{mode}'")
 
-    plt.scatter(population_coordinates[:,0], population_coordinates[:,1], c='C0', s=1)
-    plt.scatter(candidate_sites_coordinates[:,0], candidate_sites_coordinates[:,1], c='red')
-    ax = plt.gca()
+    selected_sites = list(selected_sites)
+    free_sites = list(free_sites)
 
-    ax.set_title(f'{instance_file}\nCH Sites: Green\nLS Sites: Black', fontsize=9)
+    I_size = coverage.shape[1]
+    nodes_weights = weights if weights is not None else np.ones(I_size, dtype=np.int64)
 
-    # Mark CH sites
-    for site in ch_objF_sites:
-        plt.scatter(candidate_sites_coordinates[site,0], candidate_sites_coordinates[site,1], c='green', marker='+')
-        circle = plt.Circle(candidate_sites_coordinates[site], radius, color='green', fill=False, lw=2)
-        ax.add_artist(circle)
+    # Sites as rows (gains) and as columns of each node (lost nodes covered by each site)
+    sites_coverage = coverage.astype(np.int64)
+    nodes_sites = sites_coverage.tocsc()
 
-    # Mark LS sites
-    for site in ls_objF_sites:
-        plt.scatter(candidate_sites_coordinates[site,0], candidate_sites_coordinates[site,1], c='black', marker='+')
-        circle = plt.Circle(candidate_sites_coordinates[site], radius, color='black', fill=False, lw=2)
-        ax.add_artist(circle)
+    # Number of selected sites covering each node
+    coverage_count = np.zeros(I_size, dtype=np.int64)
+    for site in selected_sites:
+        coverage_count[site_covered_nodes(coverage, site)] += 1
+
+    objective_function = node_demand(np.flatnonzero(coverage_count), weights)
+    moves = 0
+
+    # Iterate until no swap improves the solution (local optimum)
+    while len(selected_sites) > 0 and len(free_sites) > 0:
+        best_delta = 0
+        best_swap = None
+
+        # Uncovered demand of every free site
+        free_sites_array = np.array(free_sites, dtype=np.int64)
+        gain = (sites_coverage @ ((coverage_count == 0) * nodes_weights))[free_sites_array]
+
+        for i, site in enumerate(selected_sites):
+            # Drop site
+            site_nodes = site_covered_nodes(coverage, site)
+            coverage_count[site_nodes] -= 1
+            lost_nodes = site_nodes[coverage_count[site_nodes] == 0]
+            loss = node_demand(lost_nodes, weights)
+
+            # Add each free site: it also covers back the lost nodes it covers
+            delta = gain - loss + (nodes_sites[:, lost_nodes] @ nodes_weights[lost_nodes])[free_sites_array]
+
+            # Restore site
+            coverage_count[site_nodes] += 1
+
+            if mode == 'first':
+                improving_sites = np.flatnonzero(delta > 0)
+                if len(improving_sites) > 0:
+                    best_delta = delta[improving_sites[0]]
+                    best_swap = (i, improving_sites[0])
+                    break
 
-    ax.axis('equal')
-    ax.tick_params(axis='both',left=True, top=False, right=False,
-                       bottom=True, labelleft=True, labeltop=False,
-                       labelright=False, labelbottom=True)
-    ax.set_xlabel(f'Radius: {radius}\nCH - Objective Function: {ch_objF_value}\nLS - Objective Function: {ls_objF_value}')
-    #plt.show()
-    return
+            else:
+                fr_i = int(np.argmax(delta))
+                if delta[fr_i] > best_delta:
+                    best_delta = delta[fr_i]
+                    best_swap = (i, fr_i)
+
+        if best_swap is None:
+            break
+
+        # Apply swap
+        i, fr_i = best_swap
+        coverage_count[site_covered_nodes(coverage, selected_sites[i])] -= 1
+        coverage_count[site_covered_nodes(coverage, free_sites[fr_i])] += 1
+        selected_sites[i], free_sites[fr_i] = free_sites[fr_i], selected_sites[i]
+
+        objective_function += int(best_delta)
+        moves += 1
+
+    return selected_sites, objective_function, moves
+
+
+def matrix_swap_local_search(coverage, selected_sites, free_sites, weights=None):
+    """
+    Best-improvement 1-swap local search scoring every swap with sparse matrix products
+    INPUT:
+      coverage => CSR coverage matrix (J x I)
+      selected_sites => List of selected site indexes (initial solution)
+      free_sites => List of free site indexes
+      weights => Optional demand of each node, 1 per node if None
+    RETURN:
+      selected_sites => Local optimum
+      objective_function => Covered nodes (demand) of the local optimum
+      moves => Number of applied swaps
+
+    For a selected site 's' and a free site 'f':
+        unique[s] <== nodes covered only by 's' (coverage_count == 1)
+        gain[f] <== nodes of 'f' not covered by the solution (coverage_count == 0)
+        delta[s, f] = gain[f] - len(unique[s]) + len(unique[s] AND coverage[f])
+    so the whole p x (J-p) delta matrix is one sparse product per iteration.
+    """
+    selected_sites = list(selected_sites)
+    free_sites = list(free_sites)
+
+    coverage = coverage.astype(np.int64)
+    I_size = coverage.shape[1]
+    moves = 0
+
+    if weights is None:
+        weights = np.ones(I_size, dtype=np.int64)
+
+    while True:
+        selected_coverage = coverage[selected_sites]
+        free_coverage = coverage[free_sites]
+
+        # Number of selected sites covering each node
+        coverage_count = np.asarray(selected_coverage.sum(axis=0)).ravel()
+        uncovered_nodes = (coverage_count == 0) * weights
+        unique_nodes = (coverage_count == 1) * weights
+
+        if len(selected_sites) == 0 or len(free_sites) == 0:
+            break
+
+        # Nodes only covered by each selected site, as sparse rows
+        unique_coverage = selected_coverage.multiply(unique_nodes.reshape(1, I_size)).tocsr()
+
+        loss = np.asarray(unique_coverage.sum(axis=1)).ravel()
+        gain = free_coverage @ uncovered_nodes
+        overlap = (unique_coverage @ free_coverage.T).toarray()
+
+        delta = overlap + gain[np.newaxis, :] - loss[:, np.newaxis]
+
+        i, fr_i = np.unravel_index(np.argmax(delta), delta.shape)
+        if delta[i, fr_i] <= 0:
+            break
+
+        # Apply best swap
+        selected_sites[i], free_sites[fr_i] = free_sites[fr_i], selected_sites[i]
+        moves += 1
+
+    objective_function = int(weights.sum() - uncovered_nodes.sum())
+
+    return selected_sites, objective_function, moves
+
+
+def result_row(instance, result, radius=None):
+    """
+    Results row of an instance, for the JSON Lines results file
+    INPUT:
+      instance => Instance name
+      result => [CH OF, CH time, LS OF, LS time, phases]
+      radius => Radius of the result (radius sweep)
+    RETURN:
+      Row dict
+    """
+    ch_objF_value, ch_time_elapsed, ls_objF_value, ls_time_elapsed, phases = result
+
+    row = {'instance': instance}
+    if radius is not None:
+        row['radius'] = radius
+
+    row.update({'ch_of': ch_objF_value,
+                'ch_time': ch_time_elapsed,
+                'ls_of': ls_objF_value,
+                'ls_time': ls_time_elapsed,
+                'phases': phases})
+
+    return row
+
+
+def sites_range_row(instance, sites_range_row_values):
+    # Sites range row ([p, GA OF, GA sites, LS OF, LS sites]) of an instance, for the JSON Lines results file
+    p, ga_objF_value, ga_objF_sites, ls_objF_value, ls_objF_sites = sites_range_row_values
+
+    return {'instance': instance,
+            'p': p,
+            'ga_of': ga_objF_value,
+            'ga_sites': ga_objF_sites,
+            'ls_of': ls_objF_value,
+            'ls_sites': ls_objF_sites}
+
+
+def write_instance_results(results_stream, stream_rows, instance_rows):
+    """
+    Append the results of an instance, timed as its write phase
+    INPUT:
+      results_stream => Open results file
+      stream_rows => Row dicts of the instance (see append_results)
+      instance_rows => Results lists of the instance, their phases get the write time
+    """
+    write_time_start = time.perf_counter()
+    append_results(results_stream, stream_rows)
+    write_time_elapsed = time.perf_counter() - write_time_start
+
+    for row in instance_rows:
+        row[4]['write'] = write_time_elapsed
+
+
+def append_results(results_stream, rows):
+    """
+    Append rows to the JSON Lines results file, one JSON object per line, flushed right away
+    so the results of finished instances survive a crash of the batch
+    INPUT:
+      results_stream => Open results file
+      rows => List of row dicts
+    """
+    for row in rows:
+        results_stream.write(json.dumps(row, default=json_value) + '\n')
+
+    results_stream.flush()
+
+
+def json_value(value):
+    # numpy scalars (objective functions, sites) as Python numbers
+    if isinstance(value, np.generic):
+        return value.item()
+
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_results(results_file, instances_dict, radii_instances_dict, sites_range_dict):
+    """
+    Write the results of every instance to the results Excel file
+    INPUT:
+      results_file => Excel file name
+      instances_dict => {instance: [CH OF, CH time, LS OF, LS time, phases]} ("Computation results")
+      radii_instances_dict => {radius: instances_dict} of a radius sweep, empty otherwise
+      sites_range_dict => {instance: sites range rows} of a sites range, empty otherwise
+    """
+    # Excel file is saved and closed when the writer exits (pandas 1.x and 2.x+)
+    with pd.ExcelWriter(results_file, engine='xlsxwriter') as results_excel:
+        if len(radii_instances_dict) > 0:
+            # Compute experimental results (one table per radius)
+            radius_sweep_results(results_excel, radii_instances_dict)
+
+        elif len(sites_range_dict) > 0:
+            # Compute experimental results (one row per instance and p)
+            dataframe = sites_range_results(sites_range_dict)
+            dataframe.to_excel(results_excel, sheet_name="Sites range")
+
+        else:
+            # Compute experimental results
+            dataframe = computational_results(instances_dict)
+            dataframe.to_excel(results_excel, sheet_name="Computation results")
 
 
 def computational_results(instances_dict):
@@ -745,6 +1580,8 @@ def computational_results(instances_dict):
     ls_time_column = []
     absolute_imp_column = []
     relative_imp_column = []
+    phases_columns = {phase_name: [] for phase_name in PHASES}
+    peak_memory_column = []
 
     for instance in instances_dict:
         # Add instance
@@ -773,20 +1610,79 @@ def computational_results(instances_dict):
         # Calculate relative improvement
         rel_imp = "{:.2%}".format(abs_imp/ch_of)
         relative_imp_column.append(rel_imp)
+
+        # Add phase times (not measured for results read from cache)
+        phases = instances_dict[instance][4] if len(instances_dict[instance]) > 4 else {}
+        for phase_name in PHASES:
+            phases_columns[phase_name].append(phases.get(phase_name))
+
+        # Add peak memory (--memory)
+        peak_memory = phases.get('peak_memory')
+        peak_memory_column.append(peak_memory / 1024 / 1024 if peak_memory is not None else None)
     
     # Create pandas dataframe
     df = pd.DataFrame({'INSTANCE': instance_column,
                        'CH_OF': ch_of_column,
-                       'CH_time (cpu sec)': ch_time_column,
+                       'CH_time (sec)': ch_time_column,
                        'LSH_OF': ls_of_column,
-                       'LS_time (cpu sec)': ls_time_column,
+                       'LS_time (sec)': ls_time_column,
                        'ABSOLUTE IMP': absolute_imp_column,
                        'RELATIVE IMP': relative_imp_column})
     df.index+=1
     print(df.to_latex(index=False))
+
+    # Phase breakdown (sec), not part of the LaTeX table
+    for phase_name in PHASES:
+        df[f'{phase_name}_time (sec)'] = phases_columns[phase_name]
+
+    if any(peak_memory is not None for peak_memory in peak_memory_column):
+        df['peak_memory (MB)'] = peak_memory_column
+
+    print(df)
+
+    return df
+
+
+def sites_range_results(sites_range_dict):
+    instance_column = []
+    p_column = []
+    ga_of_column = []
+    ga_sites_column = []
+    ls_of_column = []
+    ls_sites_column = []
+
+    for instance in sites_range_dict:
+        for p, ga_of, ga_sites, ls_of, ls_sites in sites_range_dict[instance]:
+            instance_column.append(instance)
+            p_column.append(p)
+            ga_of_column.append(ga_of)
+            ga_sites_column.append(str(ga_sites))
+            ls_of_column.append(ls_of)
+            ls_sites_column.append(str(ls_sites) if ls_sites is not None else None)
+
+    # Create pandas dataframe
+    df = pd.DataFrame({'INSTANCE': instance_column,
+                       'P': p_column,
+                       'GA_OF': ga_of_column,
+                       'GA_SITES': ga_sites_column,
+                       'LS_OF': ls_of_column,
+                       'LS_SITES': ls_sites_column})
+    df.index+=1
     print(df)
 
     return df
+
+
+def radius_sweep_results(results_excel, radii_instances_dict):
+    # One "Computation results" table per radius
+    for radius in radii_instances_dict:
+        # Radius with no feasible instance
+        if len(radii_instances_dict[radius]) == 0:
+            continue
+
+        print(f"\n[*] RADIUS => {radius}")
+        dataframe = computational_results(radii_instances_dict[radius])
+        dataframe.to_excel(results_excel, sheet_name=f"Computation results r={radius}")
    
 if __name__ == '__main__':
     main()
\ No newline at end of file
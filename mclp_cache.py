@@ -0,0 +1,178 @@
+"""
+MCLP DISK CACHE
+*********************************************
+On-disk cache of parsed instances, coverage indexes and solver results, shared by every run
+pointing at the same cache directory.
+
+    LAYOUT:
+        <cache_directory>/<namespace>/<key>.npz
+            * instances => Parsed coordinates, key = hash of the instance file content
+            * coverage => Coverage index (CSR arrays), key = (instance hash, radius, distance metric)
+            * results => Solver results, key = (instance hash, p, radius, method)
+
+    EVICTION:
+        * Least recently used: every hit touches the entry (mtime), and after every write
+          the oldest entries are removed until the cache fits in max_bytes.
+
+    CONFIGURATION:
+        * configure_cache(cache_directory, max_bytes) => Enables the cache (mclp.py --cache-dir)
+        * Disabled by default (cache_directory = None)
+*********************************************
+"""
+
+import hashlib
+import numpy as np
+import os
+
+
+# Cache configuration of this process, see configure_cache
+CACHE_DIRECTORY = None
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Content hashes already computed by this process, by (file, mtime, size)
+FILE_HASHES = {}
+
+
+def configure_cache(cache_directory, max_bytes=CACHE_MAX_BYTES):
+    """
+    Enable (or disable with cache_directory = None) the disk cache of this process
+    INPUT:
+      cache_directory => Directory of the cache, None to disable it
+      max_bytes => Size limit of the cache, least recently used entries are evicted above it
+    """
+    global CACHE_DIRECTORY, CACHE_MAX_BYTES
+
+    CACHE_DIRECTORY = cache_directory
+    CACHE_MAX_BYTES = max_bytes
+
+
+def cache_configuration():
+    """
+    RETURN:
+      (cache_directory, max_bytes) => Arguments of configure_cache, to configure worker processes
+    """
+    return CACHE_DIRECTORY, CACHE_MAX_BYTES
+
+
+def cache_enabled():
+    return CACHE_DIRECTORY is not None
+
+
+def file_hash(file):
+    """
+    Hash of a file content
+    INPUT:
+      file => File name
+    RETURN:
+      SHA-1 hex digest of the file content
+    """
+    stat = os.stat(file)
+    file_key = (os.path.abspath(file), stat.st_mtime, stat.st_size)
+
+    if file_key in FILE_HASHES:
+        return FILE_HASHES[file_key]
+
+    digest = hashlib.sha1()
+
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+    FILE_HASHES[file_key] = digest.hexdigest()
+
+    return FILE_HASHES[file_key]
+
+
+def entry_path(namespace, key):
+    return os.path.join(CACHE_DIRECTORY, namespace, f'{key}.npz')
+
+
+def load_arrays(namespace, key):
+    """
+    Read a cache entry
+    INPUT:
+      namespace => Kind of entry (e.g. 'instances')
+      key => Entry key
+    RETURN:
+      Dict {name: array} of the entry, None if the cache is disabled or the entry is missing
+    """
+    if not cache_enabled():
+        return None
+
+    path = entry_path(namespace, key)
+
+    try:
+        with np.load(path, allow_pickle=False) as entry:
+            arrays = {name: entry[name] for name in entry.files}
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+    # Mark entry as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    return arrays
+
+
+def has_entry(namespace, key):
+    # Whether a cache entry exists, without reading it (or marking it as recently used)
+    return cache_enabled() and os.path.isfile(entry_path(namespace, key))
+
+
+def save_arrays(namespace, key, **arrays):
+    """
+    Write a cache entry and evict least recently used entries above the size limit
+    INPUT:
+      namespace => Kind of entry (e.g. 'instances')
+      key => Entry key
+      arrays => Arrays of the entry, by name
+    """
+    if not cache_enabled():
+        return
+
+    path = entry_path(namespace, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file first, so concurrent readers never see partial entries
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temporary_path, path)
+
+    evict(CACHE_MAX_BYTES)
+
+
+def evict(max_bytes):
+    """
+    Remove least recently used entries until the cache fits in max_bytes
+    INPUT:
+      max_bytes => Size limit of the cache
+    """
+    entries = []
+    for directory, directories, files in os.walk(CACHE_DIRECTORY):
+        for file in files:
+            if not file.endswith('.npz'):
+                continue
+
+            path = os.path.join(directory, file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for mtime, size, path in entries)
+
+    for mtime, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
+        total_bytes -= size
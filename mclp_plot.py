@@ -0,0 +1,255 @@
+"""
+MCLP PLOTS
+*********************************************
+Input and result plots of each instance, saved as PNG files.
+
+    RENDERING:
+        * Plots are queued to a background thread, so the solvers keep running while
+          figures are drawn and saved. At most MAX_PENDING_PLOTS plots wait in the queue,
+          a new plot waits for a free slot, so queued instance data doesn't pile up in
+          memory when rendering is slower than solving.
+        * matplotlib is imported by the rendering thread, only when a plot is requested.
+        * Figures use the object-oriented API (Figure + Agg canvas), not pyplot, so no
+          figure is kept alive after it is saved.
+        * Large instances (more than DENSITY_THRESHOLD population points) draw the demand as a
+          density raster (np.histogram2d + imshow) instead of one marker per point.
+        * Coverage circles of the selected sites are drawn as a single PatchCollection.
+
+    FILES:
+        <plot_directory>/<instance>_input.png
+        <plot_directory>/<instance>_p<number of sites>_r<radius>.png
+
+    CONFIGURATION:
+        * configure_plots(plot_directory) => Enables the plots (mclp.py --plot-dir)
+        * Disabled by default (plot_directory = None, mclp.py --no-plot)
+        * wait_plots() => Waits for the queued plots, before the process exits
+*********************************************
+"""
+
+import numpy as np
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Plot configuration of this process, see configure_plots
+PLOT_DIRECTORY = None
+
+# Population points above which the demand is drawn as a density raster
+DENSITY_THRESHOLD = 100000
+DENSITY_BINS = 512
+
+# Background rendering thread and its queued plots
+PLOT_EXECUTOR = None
+PLOT_FUTURES = []
+
+# Plots queued or being rendered at the same time (each one holds its instance coordinates)
+MAX_PENDING_PLOTS = 2
+PLOT_SLOTS = threading.BoundedSemaphore(MAX_PENDING_PLOTS)
+
+
+def configure_plots(plot_directory):
+    """
+    Enable (or disable with plot_directory = None) the plots of this process
+    INPUT:
+      plot_directory => Directory of the plot files, None to disable them
+    """
+    global PLOT_DIRECTORY
+
+    PLOT_DIRECTORY = plot_directory
+
+
+def plot_configuration():
+    """
+    RETURN:
+      plot_directory => Argument of configure_plots, to configure worker processes
+    """
+    return PLOT_DIRECTORY
+
+
+def plots_enabled():
+    return PLOT_DIRECTORY is not None
+
+
+def plot_file(instance_file, suffix):
+    instance_name = os.path.splitext(os.path.basename(instance_file))[0]
+    return os.path.join(PLOT_DIRECTORY, f'{instance_name}_{suffix}.png')
+
+
+def submit_plot(render, *arguments):
+    """
+    Queue a plot to the background rendering thread, waiting while MAX_PENDING_PLOTS are pending
+    INPUT:
+      render => Function drawing and saving the plot
+      arguments => Arguments of render
+    """
+    global PLOT_EXECUTOR
+
+    if PLOT_EXECUTOR is None:
+        PLOT_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+    PLOT_SLOTS.acquire()
+
+    try:
+        future = PLOT_EXECUTOR.submit(render, *arguments)
+    except Exception:
+        PLOT_SLOTS.release()
+        raise
+
+    future.add_done_callback(lambda future: PLOT_SLOTS.release())
+    PLOT_FUTURES.append(future)
+
+
+def wait_plots():
+    """
+    Wait until every queued plot is saved, reporting the plots that failed
+    """
+    global PLOT_FUTURES
+
+    futures = PLOT_FUTURES
+    PLOT_FUTURES = []
+
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"[-] Error: plot couldn't be saved => {type(e).__name__}: {e}")
+
+
+def plot_input(population_coordinates, candidate_sites_coordinates, instance_file):
+    if not plots_enabled():
+        return
+
+    # Coordinates are not modified by the solvers, the plot reads them without a copy
+    submit_plot(render_input, np.asarray(population_coordinates), np.asarray(candidate_sites_coordinates),
+                instance_file, plot_file(instance_file, 'input'))
+
+
+def plot_output(population_coordinates, candidate_sites_coordinates, ch_objF_sites, ch_objF_value, ls_objF_sites, ls_objF_value, radius, instance_file):
+    if not plots_enabled():
+        return
+
+    submit_plot(render_output, np.asarray(population_coordinates), np.asarray(candidate_sites_coordinates),
+                list(ch_objF_sites), ch_objF_value, list(ls_objF_sites), ls_objF_value, radius,
+                instance_file, plot_file(instance_file, f'p{len(ch_objF_sites)}_r{radius}'))
+
+
+def new_figure(title):
+    # Lazy import: matplotlib is only loaded when a plot is rendered
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8,8))
+    FigureCanvasAgg(fig)
+    fig.suptitle(title, fontsize=14, fontweight='bold')
+
+    return fig, fig.add_subplot(1, 1, 1)
+
+
+def save_figure(fig, file):
+    os.makedirs(os.path.dirname(file) or '.', exist_ok=True)
+    fig.savefig(file)
+    fig.clf()
+
+
+def draw_demand(ax, population_coordinates):
+    """
+    Draw the population points, as a density raster for large instances
+    INPUT:
+      ax => Axes of the figure
+      population_coordinates => (I, 2) coordinates of the population nodes
+    """
+    if len(population_coordinates) <= DENSITY_THRESHOLD:
+        ax.scatter(population_coordinates[:,0], population_coordinates[:,1], c='C0', s=1)
+        return
+
+    from matplotlib.colors import LogNorm
+
+    x = population_coordinates[:,0]
+    y = population_coordinates[:,1]
+    density, x_edges, y_edges = np.histogram2d(x, y, bins=[density_edges(x), density_edges(y)])
+
+    # Empty cells are left transparent
+    density = np.ma.masked_equal(density, 0)
+    ax.imshow(density.T, origin='lower', extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]),
+              cmap='Blues', norm=LogNorm(), interpolation='nearest', aspect='auto')
+
+
+def density_edges(values):
+    # Up to DENSITY_BINS bins of an integer width, so integer coordinates don't alias into stripes
+    low = np.floor(values.min())
+    high = np.floor(values.max()) + 1
+    bin_width = max(1, np.ceil((high - low) / DENSITY_BINS))
+
+    return np.arange(low, high + bin_width, bin_width) - 0.5
+
+
+def draw_candidate_sites(ax, candidate_sites_coordinates, population_size):
+    # Smaller markers when the demand is a density raster
+    marker_size = 4 if population_size > DENSITY_THRESHOLD else None
+    ax.scatter(candidate_sites_coordinates[:,0], candidate_sites_coordinates[:,1], c='red', s=marker_size)
+
+
+def draw_selected_sites(ax, candidate_sites_coordinates, sites, radius, color):
+    """
+    Mark the selected sites and their coverage circles (one collection for every circle)
+    INPUT:
+      ax => Axes of the figure
+      candidate_sites_coordinates => (J, 2) coordinates of the candidate sites
+      sites => Selected site indexes
+      radius => Service radius of each site
+      color => Color of the markers and circles
+    """
+    from matplotlib.collections import PatchCollection
+    from matplotlib.patches import Circle
+
+    if len(sites) == 0:
+        return
+
+    sites_coordinates = candidate_sites_coordinates[np.asarray(sites, dtype=np.int64)]
+    ax.scatter(sites_coordinates[:,0], sites_coordinates[:,1], c=color, marker='+')
+
+    circles = [Circle(site_coordinates, radius) for site_coordinates in sites_coordinates]
+    ax.add_collection(PatchCollection(circles, edgecolor=color, facecolor='none', lw=2))
+
+
+def render_input(population_coordinates, candidate_sites_coordinates, instance_file, file):
+    fig, ax = new_figure('INPUT')
+
+    draw_demand(ax, population_coordinates)
+    draw_candidate_sites(ax, candidate_sites_coordinates, len(population_coordinates))
+
+    ax.set_title(f'{instance_file}\nPopulation/Demand color: Blue\nCandidate sites color: Red', fontsize=9)
+
+    ax.axis('equal')
+    ax.tick_params(axis='both', left=True, top=False, right=False,
+                    bottom=True, labelleft=True, labeltop=False,
+                    labelright=False, labelbottom=True)
+
+    ax.set_xlabel(f'Population/Demand points: {len(population_coordinates)}\nCandidate sites: {len(candidate_sites_coordinates)}')
+
+    save_figure(fig, file)
+
+
+def render_output(population_coordinates, candidate_sites_coordinates, ch_objF_sites, ch_objF_value, ls_objF_sites, ls_objF_value, radius, instance_file, file):
+    fig, ax = new_figure('RESULTS')
+
+    draw_demand(ax, population_coordinates)
+    draw_candidate_sites(ax, candidate_sites_coordinates, len(population_coordinates))
+
+    ax.set_title(f'{instance_file}\nCH Sites: Green\nLS Sites: Black', fontsize=9)
+
+    # Mark CH sites
+    draw_selected_sites(ax, candidate_sites_coordinates, ch_objF_sites, radius, 'green')
+
+    # Mark LS sites
+    draw_selected_sites(ax, candidate_sites_coordinates, ls_objF_sites, radius, 'black')
+
+    ax.axis('equal')
+    ax.tick_params(axis='both',left=True, top=False, right=False,
+                       bottom=True, labelleft=True, labeltop=False,
+                       labelright=False, labelbottom=True)
+    ax.set_xlabel(f'Radius: {radius}\nCH - Objective Function: {ch_objF_value}\nLS - Objective Function: {ls_objF_value}')
+
+    save_figure(fig, file)
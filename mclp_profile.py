@@ -0,0 +1,146 @@
+"""
+MCLP INSTRUMENTATION
+*********************************************
+Per-phase timers of each solved instance, with optional peak memory and cProfile output.
+
+    PHASES (exclusive monotonic time, a nested phase is not counted in its parent):
+        * read => Reading the instance file
+        * distance => Distance computation (KD-tree radius query or distance tiles)
+        * coverage => Coverage index build from the covered pairs
+        * construct => Constructive Heuristic
+        * local_search => Local Search Heuristic
+        * greedy => Greedy Adding algorithm (mclp.py --greedy)
+        * plot => Plots (queued to the rendering thread, see mclp_plot.py)
+        * write => Results file
+
+    USAGE:
+        start_phases()
+        with phase('read'):
+            ...
+        phases = phase_times() => {phase: seconds} (+ 'peak_memory' in bytes with trace_memory)
+
+    CONFIGURATION:
+        * configure_profile(profile_directory, trace_memory)
+            * profile_directory => cProfile output of each instance (mclp.py --profile)
+                <profile_directory>/<instance>.pstats
+                <profile_directory>/<instance>.txt (sorted by cumulative time)
+            * trace_memory => Peak traced memory of each instance (tracemalloc, mclp.py --memory)
+*********************************************
+"""
+
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+
+PHASES = ['read', 'distance', 'coverage', 'construct', 'local_search', 'greedy', 'plot', 'write']
+
+# Instrumentation configuration of this process, see configure_profile
+PROFILE_DIRECTORY = None
+TRACE_MEMORY = False
+
+# Phase times of the current instance, and [phase, nested phases time] of the running phases
+PHASE_TIMES = {}
+PHASE_STACK = []
+
+
+def configure_profile(profile_directory=None, trace_memory=False):
+    """
+    Configure the instrumentation of this process
+    INPUT:
+      profile_directory => Directory of the cProfile output of each instance, None to disable it
+      trace_memory => Measure the peak memory of each instance with tracemalloc
+    """
+    global PROFILE_DIRECTORY, TRACE_MEMORY
+
+    PROFILE_DIRECTORY = profile_directory
+    TRACE_MEMORY = trace_memory
+
+
+def profile_configuration():
+    """
+    RETURN:
+      (profile_directory, trace_memory) => Arguments of configure_profile, to configure worker processes
+    """
+    return PROFILE_DIRECTORY, TRACE_MEMORY
+
+
+def start_phases():
+    # Reset the phase times (and the peak memory) for a new instance
+    PHASE_TIMES.clear()
+
+    if TRACE_MEMORY:
+        if tracemalloc.is_tracing():
+            tracemalloc.clear_traces()
+        else:
+            tracemalloc.start()
+
+
+def phase_times():
+    """
+    RETURN:
+      {phase: seconds} since start_phases, plus 'peak_memory' (bytes) if memory is traced
+    """
+    phases = dict(PHASE_TIMES)
+
+    if TRACE_MEMORY and tracemalloc.is_tracing():
+        phases['peak_memory'] = tracemalloc.get_traced_memory()[1]
+
+    return phases
+
+
+def add_phase_time(name, seconds):
+    # Time of phase 'name' measured elsewhere (e.g. an instance read by the prefetch thread)
+    PHASE_TIMES[name] = PHASE_TIMES.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    """
+    Time a block as phase 'name', excluding the time of the phases nested in it
+    """
+    PHASE_STACK.append([name, 0.0])
+    time_start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        time_elapsed = time.perf_counter() - time_start
+        name, nested_time = PHASE_STACK.pop()
+        PHASE_TIMES[name] = PHASE_TIMES.get(name, 0.0) + time_elapsed - nested_time
+
+        if PHASE_STACK:
+            PHASE_STACK[-1][1] += time_elapsed
+
+
+def profile_call(function, arguments, instance_file):
+    """
+    Call function(*arguments), profiled with cProfile if a profile directory is configured
+    INPUT:
+      function => Function to call
+      arguments => Arguments of the function
+      instance_file => Instance file name, names the profile files
+    RETURN:
+      Output of the function
+    """
+    if PROFILE_DIRECTORY is None:
+        return function(*arguments)
+
+    profiler = cProfile.Profile()
+
+    try:
+        return profiler.runcall(function, *arguments)
+    finally:
+        os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+        instance_name = os.path.splitext(os.path.basename(instance_file))[0]
+        profile_file = os.path.join(PROFILE_DIRECTORY, instance_name)
+
+        profiler.dump_stats(f'{profile_file}.pstats')
+        with open(f'{profile_file}.txt', 'w') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(50)
+
+        print(f"[*] Profile written to {profile_file}.pstats")